@@ -0,0 +1,191 @@
+# Micro-benchmarks of the gray label pipeline on locally generated samples,
+# run from the project root: python -m benchmarks.bench [case ...]
+import argparse
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from benchmarks.samples import (
+    av,
+    get_led_positions,
+    render_label_frames,
+    write_h264_video,
+    write_label_video,
+)
+from pkg.graylabel import (
+    ClipBackend,
+    ClipMode,
+    PixelDetector,
+    clip_video,
+    darken_tone,
+    detect_pixels,
+    read_labels,
+)
+from tests.graylabel.test_read_labels import _read_labels_reference
+from tests.graylabel.test_tone import _darken_tone_reference
+
+
+def _timeit(fn, *, repeat: int = 3):
+    # Best of repeat runs, the least disturbed by the rest of the machine
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started_at)
+
+    return min(timings), result
+
+
+def bench_read_labels():
+    # Vectorized read_labels against the per-pixel loop it replaced
+    size, n_pixels = (1920, 1080), 1000
+    positions = get_led_positions(n_pixels, size)
+    frames = render_label_frames(positions, size)
+
+    expected = dict(enumerate(positions))
+    assert read_labels(frames, n_pixels, positions) == expected
+    assert _read_labels_reference(frames, n_pixels, positions) == expected
+
+    loop_time, _ = _timeit(
+        lambda: _read_labels_reference(frames, n_pixels, positions), repeat=1,
+    )
+    vectorized_time, _ = _timeit(lambda: read_labels(frames, n_pixels, positions))
+    print(
+        f"read_labels {size[0]}x{size[1]}, {len(frames)} frames, {n_pixels} LEDs: "
+        f"per-pixel loop {loop_time:.2f}s, vectorized {vectorized_time:.3f}s"
+    )
+
+
+# (extension, codec, GOP), H.264 is encoded with PyAV for long GOPs
+_CLIP_SAMPLES = (
+    ("mp4", "mp4v", None),
+    ("mov", "mp4v", None),
+    ("avi", "MJPG", None),
+    ("avi", "XVID", None),
+    ("mp4", "h264", 250),
+    ("mov", "h264", 30),
+)
+_CLIP_RUNS = {
+    "opencv seek": {"mode": ClipMode.SEEK},
+    "opencv sequential": {"mode": ClipMode.SEQUENTIAL},
+    "pyav": {"backend": ClipBackend.PYAV},
+    "pyav gray": {"backend": ClipBackend.PYAV, "gray": True},
+}
+
+
+def bench_clip():
+    # Seek against sequential OpenCV reads and the PyAV backend, across
+    # containers; frames are compared to the sequential OpenCV ones
+    size, n_pixels, pattern_interval = (1920, 1080), 2000, 1
+    frames = render_label_frames(get_led_positions(n_pixels, size), size)
+
+    with TemporaryDirectory() as tmp_dir:
+        for ext, codec, gop in _CLIP_SAMPLES:
+            if av is None and gop is not None:
+                print(f"clip {codec}/{ext}: skipped, requires the \"av\" extra")
+                continue
+
+            file_path = Path(tmp_dir, f"{codec}.{ext}")
+            if gop is None:
+                write_label_video(
+                    file_path, frames, fourcc=codec, pattern_interval=pattern_interval,
+                )
+            else:
+                write_h264_video(
+                    file_path, frames, gop=gop, pattern_interval=pattern_interval,
+                )
+
+            results, reference = [], None
+            for name, options in _CLIP_RUNS.items():
+                if av is None and options.get("backend") == ClipBackend.PYAV:
+                    continue
+
+                elapsed, clipped = _timeit(lambda: np.stack([
+                    frame
+                    for _, frame in clip_video(
+                        file_path,
+                        n_pixels=n_pixels,
+                        pattern_interval=pattern_interval,
+                        **options,
+                    )
+                ]), repeat=1)
+                if name == "opencv sequential":
+                    reference = clipped
+
+                is_same = clipped.ndim != 4 or np.array_equal(clipped, reference)
+                results.append(
+                    f"{name} {elapsed * 1000:.0f}ms" + ("" if is_same else " (other frames)")
+                )
+
+            sample = f"{codec}/{ext}" + (f" GOP {gop}" if gop else "")
+            print(f"clip {sample}, {len(frames)} patterns: {', '.join(results)}")
+
+
+def bench_tone():
+    # Lookup table against the float pipeline, on noise so every value shows
+    rng = np.random.default_rng(0)
+    for width, height in ((1920, 1080), (3840, 2160)):
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+        float_time, expected = _timeit(lambda: _darken_tone_reference(
+            frame, contrast=10, highlights=-60, shadows=-100, gamma=-40,
+        ))
+        lut_time, darkened = _timeit(lambda: darken_tone(frame))
+        assert np.array_equal(darkened, expected)
+
+        print(
+            f"darken_tone {width}x{height}: "
+            f"float {float_time * 1000:.1f}ms, lut {lut_time * 1000:.1f}ms"
+        )
+
+
+def bench_detect():
+    # Both detectors on the same tone filtered base frames, a LED counts as
+    # found when a detection lands within 3 pixels of it
+    for size, n_pixels in (((640, 360), 20), ((1920, 1080), 200), ((3840, 2160), 500)):
+        positions = get_led_positions(n_pixels, size)
+        frame = darken_tone(render_label_frames(positions, size)[0])
+
+        results = []
+        for detector in PixelDetector:
+            elapsed, detected = _timeit(
+                lambda: detect_pixels(frame, n_pixels, detector=detector), repeat=5,
+            )
+            detected = np.array(detected, dtype=np.float64).reshape(-1, 2)
+            n_found = sum(
+                np.abs(detected - position).max(axis=1).min(initial=np.inf) <= 3
+                for position in positions
+            )
+            results.append(f"{detector} {elapsed * 1000:.1f}ms ({n_found} found)")
+
+        print(f"detect {size[0]}x{size[1]}, {n_pixels} LEDs: {', '.join(results)}")
+
+
+_CASES = {
+    "read_labels": bench_read_labels,
+    "clip": bench_clip,
+    "tone": bench_tone,
+    "detect": bench_detect,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "cases", nargs="*", metavar="case",
+        help=f"one of {', '.join(_CASES)}, all of them by default",
+    )
+    args = parser.parse_args()
+
+    unknown_cases = [case for case in args.cases if case not in _CASES]
+    if unknown_cases:
+        parser.error(f"unknown cases: {', '.join(unknown_cases)}")
+
+    for case in args.cases or _CASES:
+        _CASES[case]()
+
+
+if __name__ == "__main__":
+    main()
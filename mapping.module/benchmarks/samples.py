@@ -0,0 +1,143 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:  # Optional, installed with the "av" extra
+    av = None
+
+from pkg.graylabel import get_n_unique_frames_required
+
+
+_BACKGROUND = 20
+_LED_COLOR = 60, 60, 255
+_LED_RADIUS = 5
+
+
+def get_led_positions(
+    n_pixels: int,
+    size: tuple[int, int],
+    *,
+    spacing: int = 30,
+    seed: int = 0,
+) -> list[tuple[int, int]]:
+    # One LED per grid cell, jittered, so rings of neighbours never overlap
+    width, height = size
+    rng = np.random.default_rng(seed)
+    n_cols, n_rows = width // spacing - 1, height // spacing - 1
+    if n_pixels > n_cols * n_rows:
+        raise ValueError(f"{n_pixels} LEDs don't fit in {width}x{height}.")
+
+    cells = rng.choice(n_cols * n_rows, n_pixels, replace=False)
+    jitter = rng.integers(-spacing // 4, spacing // 4 + 1, (n_pixels, 2))
+
+    return [
+        (int((col + 1) * spacing + dx), int((row + 1) * spacing + dy))
+        for (row, col), (dx, dy) in zip(
+            map(lambda cell: divmod(int(cell), n_cols), cells), jitter,
+        )
+    ]
+
+
+def render_label_frames(
+    positions: list[tuple[int, int]],
+    size: tuple[int, int],
+) -> list[np.ndarray]:
+    # LED i shows label i: the base frame with every LED lit, then one frame
+    # per gray code bit
+    width, height = size
+    n_bits = get_n_unique_frames_required(len(positions))
+    frames = [
+        np.full((height, width, 3), _BACKGROUND, dtype=np.uint8)
+        for _ in range(n_bits + 1)
+    ]
+    for label, (x, y) in enumerate(positions):
+        gray = label ^ (label >> 1)
+        for frame_idx, frame in enumerate(frames):
+            if frame_idx == 0 or (gray >> (frame_idx - 1)) & 1:
+                cv2.circle(frame, (x, y), _LED_RADIUS, _LED_COLOR, -1)
+
+    return frames
+
+
+_N_NOISE_VARIANTS = 4
+
+
+def _iter_video_frames(
+    frames: list[np.ndarray],
+    *,
+    fps: int,
+    pattern_interval: float,
+    noise: int,
+    seed: int = 0,
+):
+    # Every pattern is held for pattern_interval, as the LED controller does.
+    # Sensor noise keeps codecs from encoding repeated frames for free, a few
+    # variants are cycled as adding noise to every frame costs more than the
+    # encoding itself
+    rng = np.random.default_rng(seed)
+    for frame in frames:
+        variants = [
+            np.clip(
+                frame.astype(np.int16) + rng.integers(-noise, noise + 1, frame.shape),
+                0, 255,
+            ).astype(np.uint8)
+            for _ in range(_N_NOISE_VARIANTS)
+        ]
+        for frame_idx in range(round(fps * pattern_interval)):
+            yield variants[frame_idx % _N_NOISE_VARIANTS]
+
+
+def write_label_video(
+    file_path: Path,
+    frames: list[np.ndarray],
+    *,
+    fourcc: str,
+    fps: int = 30,
+    pattern_interval: float = 1,
+    noise: int = 8,
+) -> None:
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(
+        str(file_path), cv2.VideoWriter_fourcc(*fourcc), fps, (width, height),
+    )
+    try:
+        video_frames = _iter_video_frames(
+            frames, fps=fps, pattern_interval=pattern_interval, noise=noise,
+        )
+        for frame in video_frames:
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def write_h264_video(
+    file_path: Path,
+    frames: list[np.ndarray],
+    *,
+    gop: int,
+    fps: int = 30,
+    pattern_interval: float = 1,
+    noise: int = 8,
+) -> None:
+    # Long GOPs like phone recordings, which OpenCV can't encode
+    if av is None:
+        raise RuntimeError("H.264 samples require the optional \"av\" package.")
+
+    height, width = frames[0].shape[:2]
+    with av.open(str(file_path), "w") as container:
+        stream = container.add_stream("libx264", rate=fps)
+        stream.width, stream.height, stream.pix_fmt = width, height, "yuv420p"
+        stream.options = {"g": str(gop), "preset": "ultrafast"}
+
+        video_frames = _iter_video_frames(
+            frames, fps=fps, pattern_interval=pattern_interval, noise=noise,
+        )
+        for frame_pts, frame in enumerate(video_frames):
+            video_frame = av.VideoFrame.from_ndarray(frame, format="bgr24")
+            video_frame.pts = frame_pts
+            container.mux(stream.encode(video_frame))
+
+        container.mux(stream.encode())
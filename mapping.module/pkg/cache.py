@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple
+
+
+class LRUCacheStats(NamedTuple):
+    entries: int
+    size: int
+    hits: int
+    misses: int
+
+
+def _sizeof_value(value: Any) -> int:
+    # Only arrays are worth accounting, the rest is bounded by max_entries
+    return getattr(value, "nbytes", 0)
+
+
+class LRUCache:
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        max_size: int,
+        ttl: float,
+        sizeof: Callable[[Any], int] = _sizeof_value,
+    ):
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._ttl = ttl
+        self._sizeof = sizeof
+
+        # key -> (expires_at, size, value)
+        self._items: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        self._size = 0
+        self._n_hits = 0
+        self._n_misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._pop(key)
+
+            self._n_misses += 1
+            return None
+
+        self._items.move_to_end(key)
+        self._n_hits += 1
+
+        return item[2]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if key in self._items:
+            self._pop(key)
+
+        size = self._sizeof(value)
+        if size > self._max_size:
+            return
+
+        self._items[key] = (time.monotonic() + self._ttl, size, value)
+        self._size += size
+
+        while len(self._items) > self._max_entries or self._size > self._max_size:
+            oldest_key = next(iter(self._items))
+            self._pop(oldest_key)
+
+    def stats(self) -> LRUCacheStats:
+        return LRUCacheStats(
+            entries=len(self._items),
+            size=self._size,
+            hits=self._n_hits,
+            misses=self._n_misses,
+        )
+
+    def _pop(self, key: Hashable) -> None:
+        _, size, _ = self._items.pop(key)
+        self._size -= size
@@ -1,31 +1,85 @@
+from pkg.graylabel.enums import (
+    ClipMode,
+    ClipBackend,
+    FrameAverage,
+    LabelEncoding,
+    LabelThreshold,
+    PixelDetector,
+)
 from pkg.graylabel.clip import clip_video
+from pkg.graylabel.sync import (
+    get_sync_thumbnail,
+    find_pattern_segments,
+)
 from pkg.graylabel.common import (
     get_n_unique_frames_required,
+    get_n_bits_per_frame,
+    get_n_pattern_frames,
     encode_frame,
     decode_frame,
+    get_value_channel,
+    clamp_box,
+    crop_frame,
+    get_bounding_box,
+    create_frame_stack,
+    open_frame_stack,
+    numbers_from_graylabel_bits,
+    find_label_collisions,
 )
 from pkg.graylabel.tone import darken_tone
 from pkg.graylabel.detect import (
+    DetectedBlob,
+    detect_blobs,
     detect_pixels,
+    downscale_frame,
+    upscale_pixels,
+    get_labels_box,
     score_pixels,
     read_labels,
+    read_labels_with_confidence,
 )
 from pkg.graylabel.exceptions import (
     MappingFunctionException,
     ClipVideoException,
+    CropFrameException,
     ReadLabelException,
 )
 
 __all__ = (
+    "ClipMode",
+    "ClipBackend",
+    "FrameAverage",
+    "LabelEncoding",
+    "LabelThreshold",
+    "PixelDetector",
     "clip_video",
+    "get_sync_thumbnail",
+    "find_pattern_segments",
     "get_n_unique_frames_required",
+    "get_n_bits_per_frame",
+    "get_n_pattern_frames",
     "encode_frame",
     "decode_frame",
+    "get_value_channel",
+    "clamp_box",
+    "crop_frame",
+    "get_bounding_box",
+    "create_frame_stack",
+    "open_frame_stack",
+    "numbers_from_graylabel_bits",
+    "find_label_collisions",
     "darken_tone",
+    "DetectedBlob",
+    "detect_blobs",
     "detect_pixels",
+    "downscale_frame",
+    "upscale_pixels",
+    "get_labels_box",
     "score_pixels",
     "read_labels",
+    "read_labels_with_confidence",
     "MappingFunctionException",
     "ClipVideoException",
+    "CropFrameException",
     "ReadLabelException",
 )
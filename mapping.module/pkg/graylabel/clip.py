@@ -1,40 +1,370 @@
+from bisect import bisect_right
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 
 import cv2
+import numpy as np
 
+try:
+    import av
+except ImportError:  # Optional, installed with the "av" extra
+    av = None
+
+from pkg.graylabel.enums import ClipMode, ClipBackend, LabelEncoding, FrameAverage
 from pkg.graylabel.exceptions import ClipVideoException
-from pkg.graylabel.common import get_n_unique_frames_required
+from pkg.graylabel.common import get_n_pattern_frames
+from pkg.graylabel.sync import get_sync_thumbnail, find_pattern_segments
 
 
-def clip_video(
-    file_path: Path,
-    *,
-    n_pixels: int,
-    pattern_interval: float = 1,
+# Readers yield every frame of a pattern's window under the same frame
+# index, windows are reduced to a single frame by _average_windows
+
+def _read_seek(
+    cap: cv2.VideoCapture,
+    frame_step: float,
+    n_frames: int,
+    n_average_frames: int,
 ):
-    cap = cv2.VideoCapture(file_path)
-    if not cap.isOpened():
-        raise ClipVideoException.failed_to_initialize()
+    for frame_idx in range(n_frames):
+        ret, frame = cap.read()
+        if not ret:
+            raise ClipVideoException.unexpected_end_of_capture()
+
+        pos = cap.get(cv2.CAP_PROP_POS_FRAMES)
+        yield frame_idx, frame
+
+        for _ in range(n_average_frames - 1):
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            yield frame_idx, frame
+
+        cap.set(
+            cv2.CAP_PROP_POS_FRAMES,
+            pos + frame_step,
+        )
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_step = fps * pattern_interval
 
-    n_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-    required_n_frames = get_n_unique_frames_required(n_pixels)
-    expected_cap_frames = frame_step * required_n_frames
+def _read_windows(cap: cv2.VideoCapture, windows: list[tuple[int, int]]):
+    # Walk the stream once, only frames we keep are retrieved (converted)
+    cap_pos = 0
+    for frame_idx, (start_pos, stop_pos) in enumerate(windows):
+        while cap_pos < start_pos:
+            if not cap.grab():
+                raise ClipVideoException.unexpected_end_of_capture()
 
-    if n_frames < expected_cap_frames:
-        raise ClipVideoException.not_enough_frames()
+            cap_pos += 1
 
-    for frame_idx in range(required_n_frames + 1):  # Include base frame
         ret, frame = cap.read()
         if not ret:
             raise ClipVideoException.unexpected_end_of_capture()
 
+        cap_pos += 1
         yield frame_idx, frame
 
-        pos = cap.get(cv2.CAP_PROP_POS_FRAMES)
-        cap.set(
-            cv2.CAP_PROP_POS_FRAMES,
-            pos + frame_step,
+        # Only the first frame of a window is required, the video may end
+        # right after the last pattern
+        while cap_pos < stop_pos:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            cap_pos += 1
+            yield frame_idx, frame
+
+
+def _read_sequential(
+    cap: cv2.VideoCapture,
+    frame_step: float,
+    n_frames: int,
+    n_average_frames: int,
+):
+    positions = [round(frame_idx * frame_step) for frame_idx in range(n_frames)]
+    # Windows start at the sampled frame and stop before the next one
+    windows = [
+        (pos, max(min(pos + n_average_frames, next_pos), pos + 1))
+        for pos, next_pos in zip(positions, positions[1:] + [float("inf")])
+    ]
+
+    yield from _read_windows(cap, windows)
+
+
+def _get_sync_windows(
+    thumbnails: list[np.ndarray[np.uint8]],
+    n_frames: int,
+    n_average_frames: int,
+) -> list[tuple[int, int]]:
+    # Windows are centered on the pattern midpoint, within its stable run
+    windows = []
+    for start, end in find_pattern_segments(thumbnails, n_frames):
+        mid_idx = (start + end - 1) // 2
+        window_start = max(mid_idx - (n_average_frames - 1) // 2, start)
+        windows.append((window_start, min(window_start + n_average_frames, end)))
+
+    return windows
+
+
+def _read_sync(file_path: Path, n_frames: int, n_average_frames: int):
+    # First pass decodes every frame into a small thumbnail to find where
+    # patterns are shown, the second one retrieves just those frames
+    cap = cv2.VideoCapture(file_path)
+    if not cap.isOpened():
+        raise ClipVideoException.failed_to_initialize()
+
+    try:
+        thumbnails = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            thumbnails.append(get_sync_thumbnail(frame))
+    finally:
+        cap.release()
+
+    windows = _get_sync_windows(thumbnails, n_frames, n_average_frames)
+
+    cap = cv2.VideoCapture(file_path)
+    if not cap.isOpened():
+        raise ClipVideoException.failed_to_initialize()
+
+    try:
+        yield from _read_windows(cap, windows)
+    finally:
+        cap.release()
+
+
+_READERS = {
+    ClipMode.SEEK: _read_seek,
+    ClipMode.SEQUENTIAL: _read_sequential,
+}
+
+
+def _clip_opencv(
+    file_path: Path,
+    pattern_interval: float,
+    required_n_frames: int,
+    mode: ClipMode,
+    gray: bool,
+    n_average_frames: int,
+):
+    if mode == ClipMode.SYNC:
+        frames = _read_sync(
+            file_path, required_n_frames + 1, n_average_frames,  # Include base frame
         )
+        for frame_idx, frame in frames:
+            if gray:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            yield frame_idx, frame
+
+        return
+
+    cap = cv2.VideoCapture(file_path)
+    if not cap.isOpened():
+        raise ClipVideoException.failed_to_initialize()
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_step = fps * pattern_interval
+
+        n_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        expected_cap_frames = frame_step * required_n_frames
+
+        if n_frames < expected_cap_frames:
+            raise ClipVideoException.not_enough_frames()
+
+        for frame_idx, frame in _READERS[mode](
+            cap, frame_step, required_n_frames + 1, n_average_frames,  # Include base frame
+        ):
+            if gray:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            yield frame_idx, frame
+    finally:
+        cap.release()
+
+
+def _index_stream(container, stream) -> tuple[list[int], list[int]]:
+    # Demuxing only reads packet headers, nothing is decoded here
+    frames_pts, keyframes_pts = [], []
+    for packet in container.demux(stream):
+        if packet.pts is None:  # Flushing packet
+            continue
+
+        frames_pts.append(packet.pts)
+        if packet.is_keyframe:
+            keyframes_pts.append(packet.pts)
+
+    # Packets come in decode order, frames are presented in pts order
+    return sorted(frames_pts), sorted(keyframes_pts)
+
+
+def _read_sync_pyav(
+    container,
+    stream,
+    n_frames: int,
+    n_average_frames: int,
+    output_format: str,
+):
+    # Same two passes as _read_sync, frames are matched back by their pts
+    frames_pts, thumbnails = [], []
+    for frame in container.decode(stream):
+        frames_pts.append(frame.pts)
+        thumbnails.append(get_sync_thumbnail(frame.to_ndarray(format="bgr24")))
+
+    windows = _get_sync_windows(thumbnails, n_frames, n_average_frames)
+    windows_pts = {
+        frames_pts[idx]: frame_idx
+        for frame_idx, (start, end) in enumerate(windows)
+        for idx in range(start, end)
+    }
+    last_pts = frames_pts[windows[-1][1] - 1]
+
+    container.seek(frames_pts[0], stream=stream, backward=True)
+    for frame in container.decode(stream):
+        if frame.pts in windows_pts:
+            yield windows_pts[frame.pts], frame.to_ndarray(format=output_format)
+
+        if frame.pts >= last_pts:
+            return
+
+    raise ClipVideoException.unexpected_end_of_capture()
+
+
+def _clip_pyav(
+    file_path: Path,
+    pattern_interval: float,
+    required_n_frames: int,
+    mode: ClipMode,
+    gray: bool,
+    n_average_frames: int,
+):
+    if av is None:
+        raise ClipVideoException.backend_unavailable(ClipBackend.PYAV)
+
+    try:
+        container = av.open(str(file_path))
+    except av.FFmpegError as exc:
+        raise ClipVideoException.failed_to_initialize() from exc
+
+    with container:
+        if not container.streams.video:
+            raise ClipVideoException.failed_to_initialize()
+
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        output_format = "gray" if gray else "bgr24"
+
+        if mode == ClipMode.SYNC:
+            yield from _read_sync_pyav(
+                container, stream, required_n_frames + 1, n_average_frames,  # Include base frame
+                output_format,
+            )
+            return
+
+        # Exact frame count and keyframe positions, unlike the container
+        # estimates cv2.CAP_PROP_FRAME_COUNT relies on for MOV/AVI
+        frames_pts, keyframes_pts = _index_stream(container, stream)
+        fps = float(stream.guessed_rate or stream.average_rate or 0)
+        frame_step = fps * pattern_interval
+
+        if not keyframes_pts or len(frames_pts) < frame_step * required_n_frames:
+            raise ClipVideoException.not_enough_frames()
+
+        targets_pts = [
+            frames_pts[min(round(frame_idx * frame_step), len(frames_pts) - 1)]
+            for frame_idx in range(required_n_frames + 1)  # Include base frame
+        ]
+
+        decoded_frames, frame = None, None
+        stops_pts = targets_pts[1:] + [float("inf")]
+        for frame_idx, (target_pts, stop_pts) in enumerate(zip(targets_pts, stops_pts)):
+            keyframe_pts = keyframes_pts[max(bisect_right(keyframes_pts, target_pts) - 1, 0)]
+
+            # Seek only when the target is past the next keyframe, frames of
+            # the current GOP are cheaper to decode through
+            if frame is None or keyframe_pts > frame.pts:
+                container.seek(keyframe_pts, stream=stream, backward=True)
+                decoded_frames, frame = container.decode(stream), None
+
+            while frame is None or frame.pts < target_pts:
+                frame = next(decoded_frames, None)
+                if frame is None:
+                    raise ClipVideoException.unexpected_end_of_capture()
+
+            yield frame_idx, frame.to_ndarray(format=output_format)
+
+            # Following frames of the window are decoded in order anyway, a
+            # frame reaching the next target is kept for the next iteration
+            for _ in range(n_average_frames - 1):
+                frame = next(decoded_frames, None)
+                if frame is None or frame.pts >= stop_pts:
+                    break
+
+                yield frame_idx, frame.to_ndarray(format=output_format)
+
+
+def _mean_frame(frames) -> cv2.typing.MatLike:
+    # Running sum, frames of the window are never held together
+    frames_sum, n_frames = None, 0
+    for frame in frames:
+        if frames_sum is None:
+            frames_sum = np.zeros(frame.shape, dtype=np.float32)
+
+        cv2.accumulate(frame, frames_sum)
+        n_frames += 1
+
+    return cv2.convertScaleAbs(frames_sum, alpha=1 / n_frames)
+
+
+def _median_frame(frames) -> cv2.typing.MatLike:
+    # Median needs the whole window, still bounded by n_average_frames
+    window = np.stack(list(frames))
+
+    return np.median(window, axis=0).round().astype(np.uint8)
+
+
+_AVERAGES = {
+    FrameAverage.MEAN: _mean_frame,
+    FrameAverage.MEDIAN: _median_frame,
+}
+
+
+def _average_windows(frames, n_average_frames: int, average: FrameAverage):
+    if n_average_frames <= 1:
+        yield from frames
+        return
+
+    for frame_idx, window in groupby(frames, key=itemgetter(0)):
+        yield frame_idx, _AVERAGES[average](frame for _, frame in window)
+
+
+def clip_video(
+    file_path: Path,
+    *,
+    n_pixels: int,
+    pattern_interval: float = 1,
+    mode: ClipMode = ClipMode.SEEK,
+    encoding: LabelEncoding = LabelEncoding.GRAY,
+    backend: ClipBackend = ClipBackend.OPENCV,
+    gray: bool = False,
+    n_average_frames: int = 1,
+    average: FrameAverage = FrameAverage.MEAN,
+):
+    required_n_frames = get_n_pattern_frames(n_pixels, encoding)
+
+    # PyAV keeps its own keyframe index, so seek or sequential reading is an
+    # OpenCV choice only, pattern_interval is not used when frames are synced
+    if backend == ClipBackend.PYAV:
+        frames = _clip_pyav(
+            file_path, pattern_interval, required_n_frames, mode, gray, n_average_frames,
+        )
+    else:
+        frames = _clip_opencv(
+            file_path, pattern_interval, required_n_frames, mode, gray, n_average_frames,
+        )
+
+    yield from _average_windows(frames, n_average_frames, average)
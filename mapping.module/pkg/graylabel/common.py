@@ -1,15 +1,46 @@
 import math
+from pathlib import Path
 
 import cv2
 import numpy as np
 
-from pkg.graylabel.exceptions import EncodeFrameException, DecodeFrameException
+from pkg.graylabel.enums import LabelEncoding
+from pkg.graylabel.exceptions import (
+    EncodeFrameException,
+    DecodeFrameException,
+    CropFrameException,
+)
+
+
+# x, y, width, height, same as cv2 rectangles
+type BoxT = tuple[int, int, int, int]
 
 
 def get_n_unique_frames_required(n_pixel: int):
     return math.ceil(math.log2(n_pixel))
 
 
+def get_n_bits_per_frame(encoding: LabelEncoding = LabelEncoding.GRAY) -> int:
+    return 3 if encoding == LabelEncoding.GRAY_RGB else 1
+
+
+def get_n_pattern_frames(
+    n_pixel: int,
+    encoding: LabelEncoding = LabelEncoding.GRAY,
+) -> int:
+    n_bits = get_n_unique_frames_required(n_pixel)
+
+    match encoding:
+        case LabelEncoding.GRAY_PARITY:
+            return n_bits + 1
+        case LabelEncoding.GRAY_COMPLEMENT:
+            return n_bits * 2
+        case LabelEncoding.GRAY_RGB:
+            return math.ceil(n_bits / get_n_bits_per_frame(encoding))
+        case _:
+            return n_bits
+
+
 def encode_frame(frame: cv2.typing.MatLike, ext: str = ".jpg") -> bytes:
     ret, buffer = cv2.imencode(ext, frame)
     if not ret:
@@ -18,10 +49,13 @@ def encode_frame(frame: cv2.typing.MatLike, ext: str = ".jpg") -> bytes:
     return buffer, ext
 
 
-def decode_frame(buffer: bytes) -> cv2.typing.MatLike:
+def decode_frame(
+    buffer: bytes,
+    flags: int = cv2.IMREAD_COLOR,
+) -> cv2.typing.MatLike:
     frame = cv2.imdecode(
         np.frombuffer(buffer, dtype=np.uint8),
-        cv2.IMREAD_COLOR,
+        flags,
     )
     if frame is None:
         raise DecodeFrameException.failed()
@@ -29,6 +63,63 @@ def decode_frame(buffer: bytes) -> cv2.typing.MatLike:
     return frame
 
 
+def get_value_channel(frame: cv2.typing.MatLike) -> cv2.typing.MatLike:
+    if frame.ndim == 2:
+        return frame
+
+    # HSV value of an 8-bit BGR pixel is its max channel
+    blue, green, red = cv2.split(frame)
+
+    return cv2.max(cv2.max(blue, green), red)
+
+
+def clamp_box(box: BoxT, frame_shape: tuple[int, ...]) -> BoxT:
+    x, y, width, height = box
+    frame_height, frame_width = frame_shape[:2]
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, frame_width), min(y + height, frame_height)
+    if x1 <= x0 or y1 <= y0:
+        raise CropFrameException.empty_region()
+
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def crop_frame(frame: cv2.typing.MatLike, box: BoxT) -> cv2.typing.MatLike:
+    x, y, width, height = clamp_box(box, frame.shape)
+
+    return frame[y:y + height, x:x + width]
+
+
+def get_bounding_box(
+    coords: list[tuple[float, float]],
+    *,
+    margin: int = 0,
+) -> BoxT:
+    coords_arr = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    x0, y0 = np.floor(coords_arr.min(axis=0)).astype(int) - margin
+    x1, y1 = np.floor(coords_arr.max(axis=0)).astype(int) + margin + 1
+
+    return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+
+def create_frame_stack(
+    file_path: Path,
+    n_frames: int,
+    frame_shape: tuple[int, ...],
+) -> np.memmap:
+    return np.lib.format.open_memmap(
+        file_path,
+        mode="w+",
+        dtype=np.uint8,
+        shape=(n_frames, *frame_shape),
+    )
+
+
+def open_frame_stack(file_path: Path) -> np.memmap:
+    return np.load(file_path, mmap_mode="r")
+
+
 def number_from_graylabel(label: int) -> int:
     shift, label_n = 1, label
     while (label >> shift) > 0:
@@ -46,3 +137,21 @@ def number_from_graylabel_bits(bits: list[int]) -> int:
     number = number_from_graylabel(label)
 
     return number
+
+
+def numbers_from_graylabel_bits(bits: np.ndarray[np.uint8]) -> np.ndarray[np.int64]:
+    # (n_labels, n_bits) matrix, most significant bit first as in
+    # number_from_graylabel_bits. Binary bit i is XOR of gray bits 0..i
+    binary_bits = np.bitwise_xor.accumulate(bits.astype(np.uint8), axis=1)
+    n_bits = binary_bits.shape[1]
+    weights = np.left_shift(1, np.arange(n_bits - 1, -1, -1, dtype=np.int64))
+
+    return binary_bits.astype(np.int64) @ weights
+
+
+def find_label_collisions(numbers: np.ndarray[np.int64]) -> np.ndarray[np.bool_]:
+    _, inverse, counts = np.unique(
+        numbers, return_inverse=True, return_counts=True,
+    )
+
+    return counts[inverse] > 1
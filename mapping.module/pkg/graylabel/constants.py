@@ -4,6 +4,8 @@ FLOAT_SCALE = 1.0 / UINT8_SCALE
 ADJUSTMENT_SCALE = 100.0
 
 DT_BLOCK_SIZE = 7
+DT_SUBPIXEL_RADIUS = 3
+DT_BLOB_MIN_AREA = 4
 
 SC_PIXEL_RED_LOW_HUE = 10
 SC_PIXEL_RED_HIGH_HUE = 200
@@ -14,3 +16,18 @@ SC_PIXEL_BRIGHTNESS_WEIGHT = 0.7
 SC_PIXEL_RADIUS_RANGE = 5, 11
 
 RD_LABEL_RADIUS_RANGE = 0, 3
+RD_LABEL_RGB_CHANNELS = 2, 1, 0  # BGR indices of the red, green, blue bits
+# Chroma subsampling bleeds colors, channel bits are split halfway to base
+RD_LABEL_RGB_ON_RATIO = 0.5
+RD_LABEL_MIN_CONTRAST = 40
+RD_LABEL_THRESHOLD_ITERATIONS = 4
+# Lit pixels dimmer than that relative to base mean the frame has none lit
+RD_LABEL_MIN_EXPOSURE_GAIN = 0.5
+
+SY_THUMBNAIL_SIZE = 160
+SY_PIXEL_DIFF_THRESHOLD = 24
+SY_MIN_CHANGED_PIXELS = 2
+SY_NOISE_QUANTILE = 0.75
+SY_NOISE_SCALE = 4
+SY_MIN_STABLE_FRAMES = 3
+SY_BASE_LIT_RATIO = 0.9
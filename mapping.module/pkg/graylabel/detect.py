@@ -1,9 +1,15 @@
+import math
+from functools import cache
+from typing import NamedTuple
+
 import cv2
 import numpy as np
 
 from pkg.graylabel.constants import (
     UINT8_SCALE,
     DT_BLOCK_SIZE,
+    DT_SUBPIXEL_RADIUS,
+    DT_BLOB_MIN_AREA,
     SC_PIXEL_RED_LOW_HUE,
     SC_PIXEL_RED_HIGH_HUE,
     SC_PIXEL_BRIGHT_VAL_THRESHOLD,
@@ -12,15 +18,169 @@ from pkg.graylabel.constants import (
     SC_PIXEL_BRIGHTNESS_WEIGHT,
     SC_PIXEL_RADIUS_RANGE,
     RD_LABEL_RADIUS_RANGE,
+    RD_LABEL_RGB_CHANNELS,
+    RD_LABEL_RGB_ON_RATIO,
+    RD_LABEL_MIN_CONTRAST,
+    RD_LABEL_THRESHOLD_ITERATIONS,
+    RD_LABEL_MIN_EXPOSURE_GAIN,
 )
+from pkg.graylabel.enums import LabelEncoding, LabelThreshold, PixelDetector
 from pkg.graylabel.common import (
     get_n_unique_frames_required,
-    number_from_graylabel_bits,
+    get_n_pattern_frames,
+    get_bounding_box,
+    numbers_from_graylabel_bits,
+    find_label_collisions,
 )
 from pkg.graylabel.exceptions import ReadLabelException
 
 
 type CoordT = tuple[int, int]
+type PointT = tuple[float, float]
+
+# Ring sample position(s) and bilinear weight per tap, weight is None for
+# the single nearest-pixel tap of integer coordinates
+type RingTapsT = list[tuple[np.ndarray[np.intp], np.ndarray[np.intp], np.ndarray | None]]
+
+
+def refine_centroids(
+    frame: cv2.typing.MatLike,
+    coords: list[CoordT],
+    *,
+    radius: int = DT_SUBPIXEL_RADIUS,
+) -> list[PointT]:
+    if not coords:
+        return []
+
+    height, width = frame.shape[:2]
+    window = np.arange(-radius, radius + 1)
+
+    # (n_coords, window, window) patches, gathered at once
+    coords_arr = np.array(coords, dtype=np.intp).reshape(-1, 2)
+    xs = np.clip(coords_arr[:, :1] + window, 0, width - 1)[:, np.newaxis, :]
+    ys = np.clip(coords_arr[:, 1:] + window, 0, height - 1)[:, :, np.newaxis]
+    patches = frame[ys, xs]
+    if patches.ndim == 4:  # Color frame, only the patches are converted
+        patches = cv2.cvtColor(
+            patches.reshape(-1, patches.shape[2], 3), cv2.COLOR_BGR2GRAY,
+        ).reshape(patches.shape[:3])
+
+    patches = patches.astype(np.float64)
+
+    # Background is the dimmest pixel of the patch, only the LED glow weighs
+    weights = patches - patches.min(axis=(1, 2), keepdims=True)
+    total = weights.sum(axis=(1, 2))
+    has_weight = total > 0
+
+    def _weighted_mean(positions: np.ndarray) -> np.ndarray[np.float64]:
+        return np.divide(
+            (weights * positions).sum(axis=(1, 2)),
+            total,
+            out=np.zeros(total.shape),
+            where=has_weight,
+        )
+
+    refined_x = np.where(has_weight, _weighted_mean(xs), coords_arr[:, 0])
+    refined_y = np.where(has_weight, _weighted_mean(ys), coords_arr[:, 1])
+
+    return list(zip(refined_x.tolist(), refined_y.tolist()))
+
+
+def downscale_frame(
+    frame: cv2.typing.MatLike,
+    max_resolution: int,
+) -> tuple[cv2.typing.MatLike, float]:
+    height, width = frame.shape[:2]
+    scale = max_resolution / max(height, width)
+    if scale >= 1:
+        return frame, 1.0
+
+    size = max(round(width * scale), 1), max(round(height * scale), 1)
+
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+
+def upscale_pixels(
+    frame: cv2.typing.MatLike,
+    pixels: list[CoordT] | list[PointT],
+    scale: float,
+    *,
+    subpixel: bool = False,
+) -> list[CoordT] | list[PointT]:
+    # Pixels found on a frame downscaled by scale are mapped back and refined
+    # in small full resolution windows around them
+    if scale >= 1:
+        return pixels
+
+    coords = [
+        (int((x + 0.5) / scale), int((y + 0.5) / scale))
+        for x, y in pixels
+    ]
+    refined = refine_centroids(
+        frame, coords, radius=DT_SUBPIXEL_RADIUS + math.ceil(1 / scale),
+    )
+    if subpixel:
+        return refined
+
+    return [(int(x), int(y)) for x, y in refined]
+
+
+class DetectedBlob(NamedTuple):
+    coord: CoordT | PointT
+    area: int
+    brightness: float
+
+
+def detect_blobs(
+    frame: cv2.typing.MatLike,
+    n_pixels: int,
+    *,
+    min_area: int = DT_BLOB_MIN_AREA,
+    subpixel: bool = False,
+) -> list[DetectedBlob]:
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    # LEDs are lit against a dark scene, Otsu splits the two without tuning
+    _, mask = cv2.threshold(gray_frame, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+        mask, connectivity=8, ltype=cv2.CV_32S,
+    )
+
+    # Per-component intensity sums, over the (few) foreground pixels only
+    ys, xs = np.nonzero(labels)
+    flat_labels = labels[ys, xs]
+    intensity = gray_frame[ys, xs].astype(np.float64)
+
+    intensity_sums = np.bincount(flat_labels, intensity, minlength=n_labels)
+    centroids_x = np.bincount(flat_labels, intensity * xs, minlength=n_labels)
+    centroids_y = np.bincount(flat_labels, intensity * ys, minlength=n_labels)
+
+    areas = stats[:, cv2.CC_STAT_AREA]
+    # Label 0 is the background
+    blob_labels = np.flatnonzero(areas >= min_area)
+    blob_labels = blob_labels[(blob_labels > 0) & (intensity_sums[blob_labels] > 0)]
+
+    brightness = intensity_sums[blob_labels] / areas[blob_labels]
+    centroids_x = centroids_x[blob_labels] / intensity_sums[blob_labels]
+    centroids_y = centroids_y[blob_labels] / intensity_sums[blob_labels]
+
+    # Stable, so equally bright blobs keep the scan order
+    order = np.argsort(-brightness, kind="stable")[:n_pixels]
+
+    def _blob_coord(blob_idx: int) -> CoordT | PointT:
+        x, y = centroids_x[blob_idx], centroids_y[blob_idx]
+        if subpixel:
+            return float(x), float(y)
+
+        return int(x), int(y)
+
+    return [
+        DetectedBlob(
+            coord=_blob_coord(blob_idx),
+            area=int(areas[blob_labels[blob_idx]]),
+            brightness=float(brightness[blob_idx]),
+        )
+        for blob_idx in order
+    ]
 
 
 def detect_pixels(
@@ -29,7 +189,13 @@ def detect_pixels(
     *,
     quality_levels: float = 0.02,
     min_distance: int = 14,
-) -> list[CoordT]:
+    subpixel: bool = False,
+    detector: PixelDetector = PixelDetector.CORNERS,
+) -> list[CoordT] | list[PointT]:
+    if detector == PixelDetector.BLOBS:
+        blobs = detect_blobs(frame, n_pixels, subpixel=subpixel)
+        return [blob.coord for blob in blobs]
+
     gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     tracked = cv2.goodFeaturesToTrack(
         gray_frame,
@@ -45,151 +211,431 @@ def detect_pixels(
 
         return normalized
 
-    return [
+    coords = [
         _normalize_coord(coord.ravel())
         for coord in tracked
     ]
+    if subpixel:
+        return refine_centroids(gray_frame, coords)
 
+    return coords
 
-def sample_ring_hsv(
-    frame: cv2.typing.MatLike,
-    coord: CoordT,
+
+@cache
+def get_ring_offsets(
     radius_range: tuple[int, int],
-    *,
     step_angle: int = 30,
-) -> np.ndarray[np.uint8]:
-    x, y = coord
-    height, width = frame.shape[:2]
-    ring_pixels = []
+) -> tuple[np.ndarray[np.float64], np.ndarray[np.float64]]:
+    # Scalar trig on purpose: vectorized np.cos/np.sin may differ by an ulp,
+    # which shifts truncated pixel indices
+    offsets = [
+        (radius * np.cos(radians), radius * np.sin(radians))
+        for radius in range(*radius_range)
+        for radians in map(np.radians, range(0, 360, step_angle))
+    ]
+    offsets_x, offsets_y = np.array(offsets, dtype=np.float64).T
 
-    def _is_within_frame(px: int, py: int):
-        return 0 <= px < width and 0 <= py < height
+    return offsets_x, offsets_y
 
-    for radius in range(*radius_range):
-        for angle_deg in range(0, 360, step_angle):
-            radians = np.radians(angle_deg)
-            px = int(x + radius * np.cos(radians))
-            py = int(y + radius * np.sin(radians))
 
-            if not _is_within_frame(px, py):
-                continue
+def get_ring_indices(
+    frame_shape: tuple[int, ...],
+    coords: list[CoordT],
+    radius_range: tuple[int, int],
+    *,
+    step_angle: int = 30,
+) -> tuple[np.ndarray[np.intp], np.ndarray[np.intp], np.ndarray[np.bool_]]:
+    height, width = frame_shape[:2]
+    offsets_x, offsets_y = get_ring_offsets(radius_range, step_angle)
 
-            ring_pixels.append(frame[py, px])
+    coords_arr = np.array(coords, dtype=np.intp).reshape(-1, 2)
+    px = (coords_arr[:, :1] + offsets_x).astype(np.intp)
+    py = (coords_arr[:, 1:] + offsets_y).astype(np.intp)
 
-    return np.array(ring_pixels, dtype=np.uint8)
+    valid = (0 <= px) & (px < width) & (0 <= py) & (py < height)
+    np.clip(px, 0, width - 1, out=px)
+    np.clip(py, 0, height - 1, out=py)
 
+    return px, py, valid
 
-def get_average_brightness_hsv(
-    frame: cv2.typing.MatLike,
-    coord: CoordT,
+
+def get_ring_taps(
+    frame_shape: tuple[int, ...],
+    coords: list[CoordT] | list[PointT],
     radius_range: tuple[int, int],
     *,
     step_angle: int = 30,
-) -> float:
-    ring_pixels = sample_ring_hsv(
-        frame=frame,
-        coord=coord,
-        radius_range=radius_range,
-        step_angle=step_angle,
-    )
+) -> tuple[RingTapsT, np.ndarray[np.bool_]]:
+    coords_arr = np.asarray(coords).reshape(-1, 2)
+    if np.issubdtype(coords_arr.dtype, np.integer):
+        px, py, valid = get_ring_indices(
+            frame_shape, coords, radius_range, step_angle=step_angle,
+        )
+        return [(py, px, None)], valid
+
+    # Subpixel coordinates are sampled bilinearly from the 4 neighbours
+    height, width = frame_shape[:2]
+    offsets_x, offsets_y = get_ring_offsets(radius_range, step_angle)
+    px = coords_arr[:, :1] + offsets_x
+    py = coords_arr[:, 1:] + offsets_y
+
+    valid = (0 <= px) & (px <= width - 1) & (0 <= py) & (py <= height - 1)
+    np.clip(px, 0, width - 1, out=px)
+    np.clip(py, 0, height - 1, out=py)
+
+    px0, py0 = np.floor(px).astype(np.intp), np.floor(py).astype(np.intp)
+    px1, py1 = np.minimum(px0 + 1, width - 1), np.minimum(py0 + 1, height - 1)
+    wx, wy = px - px0, py - py0
+
+    taps = [
+        (py0, px0, (1 - wx) * (1 - wy)),
+        (py0, px1, wx * (1 - wy)),
+        (py1, px0, (1 - wx) * wy),
+        (py1, px1, wx * wy),
+    ]
 
-    if not ring_pixels.size:
-        return 0.0
+    return taps, valid
 
-    vals = ring_pixels[:, 2]
-    average = float(vals.mean())
 
-    return average
+def sample_ring(
+    frame: cv2.typing.MatLike,
+    taps: RingTapsT,
+) -> np.ndarray:
+    (py, px, weight), *rest_taps = taps
+    if weight is None:
+        return frame[py, px]
+
+    def _weighted(
+        py: np.ndarray[np.intp],
+        px: np.ndarray[np.intp],
+        weight: np.ndarray[np.float64],
+    ) -> np.ndarray[np.float64]:
+        samples = frame[py, px]
+        return samples * weight.reshape(weight.shape + (1,) * (samples.ndim - weight.ndim))
+
+    samples = _weighted(py, px, weight)
+    for tap in rest_taps:
+        samples += _weighted(*tap)
+
+    return samples
+
+
+def masked_ring_mean(
+    samples: np.ndarray,
+    valid: np.ndarray[np.bool_],
+) -> np.ndarray[np.float64]:
+    # Mean over the last (ring) axis, counting only in-frame samples
+    counts = valid.sum(axis=-1)
+    sums = np.where(valid, samples, 0).sum(axis=-1, dtype=np.float64)
+
+    return np.divide(
+        sums, counts, out=np.zeros(sums.shape, dtype=np.float64), where=counts > 0,
+    )
 
 
 def score_pixels(
     frame: cv2.typing.MatLike,
     n_pixels: int,
-    candidates: list[CoordT],
-) -> list[CoordT]:
-    hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-    scores = []
-    for coord in candidates:
-        ring_pixels = sample_ring_hsv(
-            frame=hsv_frame,
-            coord=coord,
-            radius_range=SC_PIXEL_RADIUS_RANGE,
-        )
-        if not ring_pixels.size:
-            scores.append((coord, 0.0))
-            continue
-
-        ring_pixels = np.array(ring_pixels)
-        hues, sats, vals = (
-            ring_pixels[:, 0],
-            ring_pixels[:, 1],
-            ring_pixels[:, 2],
+    candidates: list[CoordT] | list[PointT],
+) -> list[CoordT] | list[PointT]:
+    if not candidates:
+        return []
+
+    taps, valid = get_ring_taps(
+        frame_shape=frame.shape,
+        coords=candidates,
+        radius_range=SC_PIXEL_RADIUS_RANGE,
+    )
+
+    samples = sample_ring(frame, taps)
+    if samples.dtype != np.uint8:
+        samples = np.clip(np.rint(samples), 0, 255).astype(np.uint8)
+
+    # (n_candidates, n_samples, 3), HSV is per pixel, so converting only
+    # the gathered samples matches converting the whole frame
+    ring_pixels = cv2.cvtColor(samples, cv2.COLOR_BGR2HSV)
+    hues, sats, vals = (
+        ring_pixels[..., 0],
+        ring_pixels[..., 1],
+        ring_pixels[..., 2],
+    )
+
+    _red_mask = (hues < SC_PIXEL_RED_LOW_HUE) | (hues > SC_PIXEL_RED_HIGH_HUE)
+    _bright_mask = vals > SC_PIXEL_BRIGHT_VAL_THRESHOLD
+    _saturated_mask = sats > SC_PIXEL_SATURATION_THRESHOLD
+    _mask = _red_mask & _bright_mask & _saturated_mask
+
+    red_score = masked_ring_mean(_mask, valid)
+    brightness_score = masked_ring_mean(vals, valid) / UINT8_SCALE
+
+    total_score = (
+        red_score * SC_PIXEL_RED_WEIGHT + brightness_score * SC_PIXEL_BRIGHTNESS_WEIGHT
+    )
+
+    # Stable, so equal scores keep candidates order
+    order = np.argsort(-total_score, kind="stable")
+    top_pixels = [candidates[idx] for idx in order[:n_pixels]]
+
+    return top_pixels
+
+
+def get_labels_box(pixels: list[CoordT] | list[PointT]):
+    # Everything read_labels samples around the pixels, bilinear taps included
+    return get_bounding_box(pixels, margin=RD_LABEL_RADIUS_RANGE[1] + 1)
+
+
+def _adaptive_thresholds(
+    brightness: np.ndarray[np.float64],
+) -> tuple[np.ndarray[np.float64], np.ndarray[np.float64], np.ndarray[np.float64]]:
+    # Two-means over the brightness along axis 0, the on cluster always keeps
+    # the maximum, so it is never empty
+    lows, highs = brightness.min(axis=0), brightness.max(axis=0)
+    threshold = (lows + highs) / 2
+    on_level, off_level = highs, lows
+
+    for _ in range(RD_LABEL_THRESHOLD_ITERATIONS):
+        is_on = brightness >= threshold
+        n_on = is_on.sum(axis=0)
+        on_level = np.where(is_on, brightness, 0).sum(axis=0) / n_on
+        off_level = np.divide(
+            np.where(is_on, 0, brightness).sum(axis=0),
+            len(brightness) - n_on,
+            out=lows.copy(),
+            where=n_on < len(brightness),
         )
+        threshold = (on_level + off_level) / 2
+
+    return threshold, on_level, off_level
+
+
+def _exposure_gains(
+    brightness: np.ndarray[np.float64],
+) -> np.ndarray[np.float64]:
+    # (n_frames, n_samples) brightness, the first frame is the base one.
+    # Exposure drifts scale whole frames, so the pixels lit in a pattern frame
+    # are, relative to the base frame, as bright as its gain is
+    ratios = brightness[1:] / np.maximum(brightness[:1], 1.0)
+    _, lit_ratios, _ = _adaptive_thresholds(ratios.T)
 
-        _red_mask = (hues < SC_PIXEL_RED_LOW_HUE) | (hues > SC_PIXEL_RED_HIGH_HUE)
-        _bright_mask = vals > SC_PIXEL_BRIGHT_VAL_THRESHOLD
-        _saturated_mask = sats > SC_PIXEL_SATURATION_THRESHOLD
-        _mask = _red_mask & _bright_mask & _saturated_mask
+    return np.where(lit_ratios >= RD_LABEL_MIN_EXPOSURE_GAIN, lit_ratios, 1.0)
 
-        red_score = np.sum(_mask) / len(ring_pixels)
-        brightness_score = np.mean(vals) / UINT8_SCALE
 
-        total_score = (
-            red_score * SC_PIXEL_RED_WEIGHT + brightness_score * SC_PIXEL_BRIGHTNESS_WEIGHT
+def _threshold_states(
+    brightness: np.ndarray[np.float64],
+    threshold: np.ndarray[np.float64],
+    *,
+    threshold_mode: LabelThreshold,
+) -> tuple[np.ndarray[np.bool_], np.ndarray[np.float64]]:
+    # (n_frames, n_coords, ...) brightness, the first frame is the base one;
+    # threshold is the base frame one, used unless adapted
+    base_brightness, frames_brightness = brightness[0], brightness[1:]
+    on_level, off_level = base_brightness, np.zeros_like(base_brightness)
+
+    if threshold_mode == LabelThreshold.ADAPTIVE:
+        # Pattern frames are brought back to the base frame exposure first,
+        # otherwise a dimmer frame reads as unlit against the base threshold
+        gains = _exposure_gains(brightness.reshape(len(brightness), -1))
+        frames_brightness = frames_brightness / np.expand_dims(
+            gains, tuple(range(1, frames_brightness.ndim)),
         )
-        scores.append((coord, total_score))
 
-    scores.sort(key=lambda value: value[1], reverse=True)
-    top_pixels = [coord for coord, _ in scores[:n_pixels]]
+        # Only pattern frames are clustered, with the base frame a pixel lit
+        # in all of them would be split into base and the rest. Trailing axes
+        # (channels) are pooled, one threshold per pixel
+        levels = np.moveaxis(frames_brightness, 1, -1).reshape(-1, brightness.shape[1])
+        adaptive_threshold, adaptive_on, adaptive_off = (
+            np.expand_dims(level, tuple(range(1, base_brightness.ndim)))
+            for level in _adaptive_thresholds(levels)
+        )
+        # Pixels that barely change across pattern frames (always or never
+        # lit) have no clusters to split, they keep the base frame threshold
+        has_contrast = np.expand_dims(
+            levels.max(axis=0) - levels.min(axis=0) >= RD_LABEL_MIN_CONTRAST,
+            tuple(range(1, base_brightness.ndim)),
+        )
+        threshold = np.where(has_contrast, adaptive_threshold, threshold)
+        on_level = np.where(has_contrast, adaptive_on, on_level)
+        off_level = np.where(has_contrast, adaptive_off, off_level)
+
+    states = frames_brightness >= threshold
+    # Distance to the threshold, relative to the span of the side it fell on
+    margins = np.where(
+        states,
+        (frames_brightness - threshold) / np.maximum(on_level - threshold, 1.0),
+        (threshold - frames_brightness) / np.maximum(threshold - off_level, 1.0),
+    )
 
-    return top_pixels
+    return states, margins
 
 
-def read_labels(
+def _correct_parity(
+    states: np.ndarray[np.bool_],
+    margins: np.ndarray[np.float64],
+) -> tuple[np.ndarray[np.bool_], np.ndarray[np.float64]]:
+    # Label bits XOR the parity bit is zero for a correctly read pixel. A
+    # single parity bit only detects an error, it can't tell which bit is
+    # wrong: as a best effort the least certain bit is flipped, which fixes
+    # a weakly lit bit, but a confidently misread one stays a wrong label
+    states, margins = states.copy(), margins.copy()
+    is_corrupted = np.bitwise_xor.reduce(states, axis=0)
+    corrupted_cols = np.flatnonzero(is_corrupted)
+    weakest_rows = margins[:, corrupted_cols].argmin(axis=0)
+
+    states[weakest_rows, corrupted_cols] ^= True
+    margins[weakest_rows, corrupted_cols] = np.inf
+
+    confidence = margins.min(axis=0)
+    confidence[corrupted_cols] *= 0.5
+
+    return states[:-1], confidence
+
+
+def _read_label_bits(
     frames: list[cv2.typing.MatLike],
     n_pixels: int,
-    pixels: list[CoordT],
+    pixels: list[CoordT] | list[PointT],
     *,
-    on_threshold_scatter: int = 10
-) -> dict[int, CoordT]:
-    required_n_frames = get_n_unique_frames_required(n_pixels)
+    on_threshold_scatter: int,
+    encoding: LabelEncoding,
+    threshold_mode: LabelThreshold,
+) -> tuple[list[CoordT] | list[PointT], np.ndarray[np.bool_], np.ndarray[np.float64]]:
+    n_bits = get_n_unique_frames_required(n_pixels)
+    required_n_frames = get_n_pattern_frames(n_pixels, encoding)
     if len(frames) < required_n_frames + 1:
         raise ReadLabelException.frames_count_mismatch()
 
-    base_frame, *rest_frames = frames
-    base_frame_hsv = cv2.cvtColor(base_frame, cv2.COLOR_BGR2HSV)
-    pixels_brightness_map = {
-        coord: get_average_brightness_hsv(
-            frame=base_frame_hsv,
-            coord=coord,
-            radius_range=RD_LABEL_RADIUS_RANGE
-        )
-        for coord in pixels
-    }
+    coords = list(dict.fromkeys(pixels))
+    if not coords:
+        return coords, np.zeros((0, n_bits), dtype=np.bool_), np.zeros(0)
+
+    taps, valid = get_ring_taps(
+        frame_shape=frames[0].shape,
+        coords=coords,
+        radius_range=RD_LABEL_RADIUS_RANGE,
+    )
 
-    def _read_pixel_state(frame_hsv: cv2.typing.MatLike, coord: CoordT) -> int:
-        brightness = get_average_brightness_hsv(
-            frame=frame_hsv,
-            coord=coord,
-            radius_range=RD_LABEL_RADIUS_RANGE
+    if encoding == LabelEncoding.GRAY_RGB:
+        # (n_frames, n_coords, 3, n_samples), every channel is read on its own
+        samples = np.stack([
+            np.moveaxis(sample_ring(frame, taps), -1, -2)
+            for frame in frames[:required_n_frames + 1]
+        ])
+        brightness = masked_ring_mean(samples, valid[np.newaxis, :, np.newaxis])
+        # (n_frames, n_coords, red/green/blue)
+        brightness = brightness[..., RD_LABEL_RGB_CHANNELS]
+
+        states, margins = _threshold_states(
+            brightness,
+            brightness[0] * RD_LABEL_RGB_ON_RATIO,
+            threshold_mode=threshold_mode,
+        )
+        # Frame i holds bits 3i (red), 3i + 1 (green) and 3i + 2 (blue)
+        states = np.moveaxis(states, -1, 1).reshape(-1, len(coords))[:n_bits]
+        margins = np.moveaxis(margins, -1, 1).reshape(-1, len(coords))[:n_bits]
+
+        bits = states[::-1].T
+        confidence = margins.min(axis=0, initial=np.inf)
+
+        return coords, bits, np.clip(confidence, 0.0, 1.0)
+
+    def _gather_value(frame: cv2.typing.MatLike) -> np.ndarray:
+        samples = sample_ring(frame, taps)
+        if samples.ndim == 2:  # Already a single (V) channel
+            return samples
+
+        # Same as get_value_channel, only for the gathered samples
+        return samples.max(axis=-1)
+
+    # (n_frames, n_coords, n_samples), one gather per frame
+    samples = np.stack([
+        _gather_value(frame)
+        for frame in frames[:required_n_frames + 1]
+    ])
+    brightness = masked_ring_mean(samples, valid[np.newaxis])
+
+    base_brightness, frames_brightness = brightness[0], brightness[1:]
+
+    if encoding == LabelEncoding.GRAY_COMPLEMENT:
+        on_brightness, off_brightness = frames_brightness[0::2], frames_brightness[1::2]
+        states = on_brightness > off_brightness
+        # Relative to how bright the pixel is when fully lit
+        margins = (
+            np.abs(on_brightness - off_brightness) / np.maximum(base_brightness, 1.0)
         )
-        state = int(brightness >= pixels_brightness_map[coord] - on_threshold_scatter)
+        confidence = margins.min(axis=0)
+    else:
+        states, margins = _threshold_states(
+            brightness,
+            base_brightness - on_threshold_scatter,
+            threshold_mode=threshold_mode,
+        )
+
+        if encoding == LabelEncoding.GRAY_PARITY:
+            states, confidence = _correct_parity(states, margins)
+        else:
+            confidence = margins.min(axis=0, initial=np.inf)
 
-        return state
+    # Frame i holds bit i of the label, so the last frame is the most significant
+    bits = states[::-1].T
 
-    positions_bits = {coord: [] for coord in pixels}
-    for frame_idx in range(required_n_frames):
-        frame =  rest_frames[frame_idx]
-        frame_hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    return coords, bits, np.clip(confidence, 0.0, 1.0)
 
-        for coord in positions_bits:
-            state = _read_pixel_state(frame_hsv, coord)
-            positions_bits[coord].append(state)
+
+def read_labels_with_confidence(
+    frames: list[cv2.typing.MatLike],
+    n_pixels: int,
+    pixels: list[CoordT] | list[PointT],
+    *,
+    on_threshold_scatter: int = 10,
+    encoding: LabelEncoding = LabelEncoding.GRAY,
+    threshold_mode: LabelThreshold = LabelThreshold.BASE,
+) -> dict[int, tuple[CoordT | PointT, float]]:
+    coords, bits, confidence = _read_label_bits(
+        frames=frames,
+        n_pixels=n_pixels,
+        pixels=pixels,
+        on_threshold_scatter=on_threshold_scatter,
+        encoding=encoding,
+        threshold_mode=threshold_mode,
+    )
+    numbers = numbers_from_graylabel_bits(bits)
+
+    # Labels past n_pixels are misread bits, as valid as a collision is not
+    out_of_range = numbers >= n_pixels
+    if out_of_range.any():
+        raise ReadLabelException.labels_out_of_range(int(out_of_range.sum()))
+
+    collisions = find_label_collisions(numbers)
+    if collisions.any():
+        raise ReadLabelException.labels_collision(int(collisions.sum()))
 
     positions = {
-        number_from_graylabel_bits(reversed(bits)): coord
-        for coord, bits in positions_bits.items()
+        int(number): (coord, float(pixel_confidence))
+        for number, coord, pixel_confidence in zip(numbers, coords, confidence)
     }
 
     return positions
+
+
+def read_labels(
+    frames: list[cv2.typing.MatLike],
+    n_pixels: int,
+    pixels: list[CoordT] | list[PointT],
+    *,
+    on_threshold_scatter: int = 10,
+    encoding: LabelEncoding = LabelEncoding.GRAY,
+    threshold_mode: LabelThreshold = LabelThreshold.BASE,
+) -> dict[int, CoordT | PointT]:
+    positions = read_labels_with_confidence(
+        frames=frames,
+        n_pixels=n_pixels,
+        pixels=pixels,
+        on_threshold_scatter=on_threshold_scatter,
+        encoding=encoding,
+        threshold_mode=threshold_mode,
+    )
+
+    return {
+        number: coord
+        for number, (coord, _) in positions.items()
+    }
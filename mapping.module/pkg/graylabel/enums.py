@@ -0,0 +1,34 @@
+from enum import StrEnum, auto
+
+
+class ClipMode(StrEnum):
+    SEEK = auto()
+    SEQUENTIAL = auto()
+    SYNC = auto()  # Pattern frames are located by scanning the whole video
+
+
+class FrameAverage(StrEnum):
+    MEAN = auto()
+    MEDIAN = auto()  # Ignores single-frame outliers (glints, blur)
+
+
+class ClipBackend(StrEnum):
+    OPENCV = auto()
+    PYAV = auto()  # Requires the optional "av" package
+
+
+class LabelEncoding(StrEnum):
+    GRAY = auto()
+    GRAY_PARITY = auto()  # Extra XOR frame, detects a misread bit, fixes weak ones only
+    GRAY_COMPLEMENT = auto()  # Every bit frame is followed by its inverse
+    GRAY_RGB = auto()  # Red, green and blue channels carry a bit each
+
+
+class LabelThreshold(StrEnum):
+    BASE = auto()  # Base frame brightness minus a fixed scatter
+    ADAPTIVE = auto()  # Midpoint of the pixel's own on/off brightness clusters
+
+
+class PixelDetector(StrEnum):
+    CORNERS = auto()  # Shi-Tomasi corners
+    BLOBS = auto()  # Connected components of the thresholded frame
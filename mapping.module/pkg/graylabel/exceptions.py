@@ -14,6 +14,10 @@ class ClipVideoException(MappingFunctionException):
     def unexpected_end_of_capture(cls):
         return cls("Unexpected end of video capture.")
 
+    @classmethod
+    def backend_unavailable(cls, backend: str):
+        return cls(f"Video backend '{backend}' is not installed.")
+
 
 class EncodeFrameException(MappingFunctionException):
     @classmethod
@@ -27,7 +31,21 @@ class DecodeFrameException(MappingFunctionException):
         return cls("Failed to decode frame into mat.")
 
 
-class ReadLabelException(Exception):
+class CropFrameException(MappingFunctionException):
+    @classmethod
+    def empty_region(cls):
+        return cls("Crop region does not overlap the frame.")
+
+
+class ReadLabelException(MappingFunctionException):
     @classmethod
     def frames_count_mismatch(cls):
         return cls("Number of required frames to read given number of pixels is less.")
+
+    @classmethod
+    def labels_collision(cls, n_pixels: int):
+        return cls(f"{n_pixels} pixels were read as the same labels.")
+
+    @classmethod
+    def labels_out_of_range(cls, n_pixels: int):
+        return cls(f"{n_pixels} pixels were read as labels beyond the total number of pixels.")
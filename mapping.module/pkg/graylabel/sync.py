@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+from pkg.graylabel.constants import (
+    SY_THUMBNAIL_SIZE,
+    SY_PIXEL_DIFF_THRESHOLD,
+    SY_MIN_CHANGED_PIXELS,
+    SY_NOISE_QUANTILE,
+    SY_NOISE_SCALE,
+    SY_MIN_STABLE_FRAMES,
+    SY_BASE_LIT_RATIO,
+)
+from pkg.graylabel.exceptions import ClipVideoException
+from pkg.graylabel.common import get_value_channel
+
+
+def get_sync_thumbnail(frame: cv2.typing.MatLike) -> np.ndarray[np.uint8]:
+    height, width = frame.shape[:2]
+    scale = SY_THUMBNAIL_SIZE / max(height, width)
+    if scale < 1:
+        size = max(round(width * scale), 1), max(round(height * scale), 1)
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    return get_value_channel(frame)
+
+
+def _count_changed(
+    thumbnails: np.ndarray[np.int16],
+    other_thumbnails: np.ndarray[np.int16],
+) -> np.ndarray[np.intp]:
+    # A single LED toggling changes a few thumbnail pixels a lot, while
+    # sensor noise and compression change many of them a little
+    changed = np.abs(thumbnails - other_thumbnails) > SY_PIXEL_DIFF_THRESHOLD
+
+    return changed.sum(axis=(-2, -1))
+
+
+def find_pattern_segments(
+    thumbnails: list[np.ndarray[np.uint8]],
+    n_frames: int,
+) -> list[tuple[int, int]]:
+    if len(thumbnails) < 2:
+        raise ClipVideoException.not_enough_frames()
+
+    thumbs = np.stack(thumbnails).astype(np.int16)
+    n_changed = _count_changed(thumbs[1:], thumbs[:-1])
+    # Transitions are a minority of frame pairs, so the upper quartile still
+    # measures noise only, while the median is zero for most clean videos
+    noise_level = np.quantile(n_changed, SY_NOISE_QUANTILE)
+    change_threshold = (noise_level + SY_MIN_CHANGED_PIXELS) * SY_NOISE_SCALE
+
+    # Frames between two transitions show one pattern, short runs are the
+    # transitions themselves (blur, rolling shutter)
+    boundaries = np.flatnonzero(n_changed > change_threshold) + 1
+    segments = [
+        (int(start), int(end))
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(thumbs)])
+        if end - start >= SY_MIN_STABLE_FRAMES
+    ]
+
+    # Runs split by a glitch (autofocus, exposure) still show the same
+    # pattern, they are merged and the longest piece is kept
+    patterns: list[tuple[int, int]] = []
+    for start, end in segments:
+        mid_idx = (start + end - 1) // 2
+        if patterns:
+            last_start, last_end = patterns[-1]
+            last_mid_idx = (last_start + last_end - 1) // 2
+            is_same = _count_changed(thumbs[mid_idx], thumbs[last_mid_idx]) <= change_threshold
+            if is_same:
+                if end - start > last_end - last_start:
+                    patterns[-1] = (start, end)
+
+                continue
+
+        patterns.append((start, end))
+
+    mid_indices = [(start + end - 1) // 2 for start, end in patterns]
+    if not patterns:
+        raise ClipVideoException.not_enough_frames()
+
+    # The base frame has every LED lit, so it's the first pattern lighting
+    # the most pixels, anything captured before it is skipped. Lit pixels
+    # are counted above the dimmest pattern, as a mean brightness would be
+    # dominated by the background and its noise
+    mid_thumbs = thumbs[mid_indices]
+    n_lit = _count_changed(mid_thumbs, mid_thumbs.min(axis=0))
+    base_idx = int(np.argmax(n_lit >= n_lit.max() * SY_BASE_LIT_RATIO))
+
+    segments = patterns[base_idx:base_idx + n_frames]
+    if len(segments) < n_frames:
+        raise ClipVideoException.not_enough_frames()
+
+    return segments
+
@@ -15,8 +15,8 @@ def make_darken_tone(
     shadows: int = 0,
     gamma: int = 0,
 ):
-    def _darken_tone(frame: cv2.typing.MatLike) -> cv2.typing.MatLike:
-        img_f = frame.astype(np.float32) * FLOAT_SCALE
+    def _tone_values(values: np.ndarray[np.uint8]) -> np.ndarray[np.uint8]:
+        img_f = values.astype(np.float32) * FLOAT_SCALE
 
         # Contrast
         c = (contrast / ADJUSTMENT_SCALE) + 1.0
@@ -43,6 +43,13 @@ def make_darken_tone(
 
         return (img_f * UINT8_SCALE).astype(np.uint8)
 
+    # The transform is a per-channel function of a uint8 value, so it is
+    # evaluated once for all 256 values and applied as a lookup table
+    lut = _tone_values(np.arange(256, dtype=np.uint8))
+
+    def _darken_tone(frame: cv2.typing.MatLike) -> cv2.typing.MatLike:
+        return cv2.LUT(frame, lut)
+
     return _darken_tone
 
 
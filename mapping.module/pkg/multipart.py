@@ -0,0 +1,197 @@
+from typing import AsyncIterator
+from collections import deque
+from functools import cached_property
+
+from python_multipart.exceptions import ParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartStreamException(Exception): ...
+
+
+class _Part:
+    def __init__(self):
+        self.headers: dict[bytes, bytes] = {}
+        self.data: deque[bytes] = deque()
+        self.size = 0
+        self.is_finished = False
+
+    # Headers are complete once the part is handed out
+    @cached_property
+    def disposition(self) -> dict[bytes, bytes]:
+        _, options = parse_options_header(
+            self.headers.get(b"content-disposition"),
+        )
+
+        return options
+
+
+class MultipartFilePart:
+    def __init__(self, reader: "MultipartStreamReader", part: _Part):
+        self._reader = reader
+        self._part = part
+
+    @property
+    def name(self) -> str:
+        return self._part.disposition.get(b"name", b"").decode()
+
+    @property
+    def filename(self) -> str:
+        return self._part.disposition.get(b"filename", b"").decode()
+
+    async def read(self, size: int) -> bytes:
+        chunks, n_read = [], 0
+        while n_read < size:
+            if not self._part.data:
+                if self._part.is_finished:
+                    break
+
+                await self._reader.feed()
+                continue
+
+            chunk = self._part.data.popleft()
+            if n_read + len(chunk) > size:
+                chunk, rest = chunk[:size - n_read], chunk[size - n_read:]
+                self._part.data.appendleft(rest)
+
+            chunks.append(chunk)
+            n_read += len(chunk)
+
+        return b"".join(chunks)
+
+
+# Unlike the spooling form parser, file content is pulled from the stream
+# only while the file part is read, so fields must precede the file part.
+class MultipartStreamReader:
+    def __init__(
+        self,
+        content_type: str | None,
+        stream: AsyncIterator[bytes],
+        *,
+        max_fields: int = 1000,
+        max_part_size: int = 1024 * 1024,
+    ):
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise MultipartStreamException("Missing boundary in multipart.")
+
+        self._stream = stream
+        # Same limits as the spooling form parser, fields are kept in memory
+        self._max_fields = max_fields
+        self._max_part_size = max_part_size
+        self._n_fields = 0
+        self._current_part: _Part | None = None
+        self._ready_parts: deque[_Part] = deque()
+        self._header_field = b""
+        self._header_value = b""
+        self._is_finished = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    async def read_until_file(self) -> tuple[dict[str, str], MultipartFilePart | None]:
+        fields = {}
+        while True:
+            part = await self._next_part()
+            if part is None:
+                return fields, None
+
+            if b"filename" in part.disposition:
+                return fields, MultipartFilePart(self, part)
+
+            name = part.disposition.get(b"name", b"").decode()
+            fields[name] = (await self._read_part(part)).decode()
+
+    async def read_trailing_fields(self) -> dict[str, str]:
+        # Drains the parts left once the file part is read, so fields sent
+        # after it can be told apart from the ones that were never sent
+        fields = {}
+        while (part := await self._next_part()) is not None:
+            if b"filename" in part.disposition:
+                # Extra files are skipped without being kept in memory
+                while not part.is_finished:
+                    part.data.clear()
+                    await self.feed()
+
+                continue
+
+            name = part.disposition.get(b"name", b"").decode()
+            fields[name] = (await self._read_part(part)).decode()
+
+        return fields
+
+    async def feed(self) -> None:
+        if self._is_finished:
+            raise MultipartStreamException("Unexpected end of multipart.")
+
+        try:
+            chunk = await anext(self._stream)
+        except StopAsyncIteration:
+            chunk = None
+
+        try:
+            if chunk is None:
+                self._is_finished = True
+                self._parser.finalize()
+            else:
+                self._parser.write(chunk)
+        except ParseError as exc:
+            raise MultipartStreamException("Malformed multipart.") from exc
+
+    async def _read_part(self, part: _Part) -> bytes:
+        while not part.is_finished:
+            await self.feed()
+
+        return b"".join(part.data)
+
+    async def _next_part(self) -> _Part | None:
+        while not self._ready_parts:
+            if self._is_finished:
+                return None
+
+            await self.feed()
+
+        return self._ready_parts.popleft()
+
+    def _on_part_begin(self) -> None:
+        self._current_part = _Part()
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._current_part
+        part.size += end - start
+        if part.size > self._max_part_size and b"filename" not in part.disposition:
+            raise MultipartStreamException(
+                f"Part exceeded maximum size of {self._max_part_size // 1024}KB."
+            )
+
+        part.data.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._current_part.is_finished = True
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._current_part.headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self) -> None:
+        if b"filename" not in self._current_part.disposition:
+            self._n_fields += 1
+            if self._n_fields > self._max_fields:
+                raise MultipartStreamException(
+                    f"Too many fields. Maximum number of fields is {self._max_fields}."
+                )
+
+        self._ready_parts.append(self._current_part)
@@ -1,17 +1,18 @@
+import io
 from pathlib import Path
 from uuid import UUID
 from functools import cached_property
 
 from fastapi import (
-    Form,
-    File,
-    UploadFile,
     Depends,
     FastAPI,
+    HTTPException,
     Request,
 )
+from fastapi.exceptions import RequestValidationError
 from fastapi.routing import APIRouter
 from fastapi.responses import JSONResponse, FileResponse
+from pydantic import ValidationError
 from starlette import status
 
 from src.mapping import MappingApp, get_mapping_app
@@ -19,6 +20,12 @@ from src.mapping import dto as mapping_dto
 from src.mapping.enums import Strategy as MappingStrategy
 from src.mapping.exceptions import MappingException
 from pkg.snake_case import from_pascal_to_snake_case
+from pkg.graylabel import LabelEncoding
+from pkg.multipart import (
+    MultipartStreamReader,
+    MultipartFilePart,
+    MultipartStreamException,
+)
 
 
 router = APIRouter(
@@ -46,15 +53,95 @@ async def _handle_mapping_exception(request: Request, exc: MappingException):
     )
 
 
+_REWIND_BUFFER_SIZE = 64 * 1024
+
+# Form fields are listed before the file, clients (and docs) must send them
+# in this order, as the file is streamed while the request is being read
+_STRATEGY_INIT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["total_pixels", "strategy", "file"],
+                    "properties": {
+                        "total_pixels": {"type": "integer"},
+                        "strategy": {
+                            "type": "string",
+                            "enum": list(MappingStrategy),
+                        },
+                        "label_encoding": {
+                            "type": "string",
+                            "enum": list(LabelEncoding),
+                            "default": LabelEncoding.GRAY,
+                        },
+                        "roi": {
+                            "type": "string",
+                            "description": "Frame region to keep: x,y,width,height",
+                        },
+                        "file": {"type": "string", "format": "binary"},
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+_STRATEGY_INIT_FIELDS = ("total_pixels", "strategy", "label_encoding", "roi")
+
+
 class MappingFileAdapter:
-    def __init__(self, file: UploadFile):
+    def __init__(self, reader: MultipartStreamReader, file: MultipartFilePart):
+        self._reader = reader
         self._file = file
+        # Request body can't be re-read, keep the head to allow rewinding once
+        self._head: bytearray | None = bytearray()
+        self._replay = b""
+        self._is_drained = False
 
     async def read(self, chunk_size: int):
-        return await self._file.read(chunk_size)
+        if self._replay:
+            chunk = self._replay[:chunk_size]
+            self._replay = self._replay[chunk_size:]
+            return chunk
+
+        chunk = await self._file.read(chunk_size)
+        if self._head is not None:
+            self._head += chunk
+            if len(self._head) > _REWIND_BUFFER_SIZE:
+                self._head = None
+
+        if len(chunk) < chunk_size and not self._is_drained:
+            # File part is over, fields sent after it would otherwise be
+            # silently dropped, reject them before the job is queued
+            self._is_drained = True
+            await self._check_trailing_fields()
+
+        return chunk
+
+    async def _check_trailing_fields(self):
+        trailing_fields = await self._reader.read_trailing_fields()
+        trailing_errors = [
+            {
+                "type": "value_error",
+                "loc": ("body", name),
+                "msg": "Field must be sent before the file part",
+                "input": trailing_fields[name],
+            }
+            for name in _STRATEGY_INIT_FIELDS
+            if name in trailing_fields
+        ]
+        if trailing_errors:
+            raise RequestValidationError(trailing_errors)
 
     async def seek(self, offset: int):
-        return await self._file.seek(offset)
+        if self._head is None or offset > len(self._head):
+            raise io.UnsupportedOperation("Streamed file can only be rewound once to its head.")
+
+        self._replay = bytes(self._head[offset:])
+        self._head = None
 
     @cached_property
     def name(self):
@@ -62,7 +149,7 @@ class MappingFileAdapter:
 
     @property
     def size(self):
-        return self._file.size
+        return None
 
     @cached_property
     def extension(self):
@@ -80,20 +167,83 @@ async def mapping_file(
     return FileResponse(filesystem_path)
 
 
-@router.post("/mapping/strategy/init/")
+@router.get("/mapping/workers/stats/")
+async def mapping_workers_stats(
+    mapping_app: MappingApp = Depends(get_mapping_app),
+) -> mapping_dto.WorkerPoolStatsResult:
+    return mapping_dto.WorkerPoolStatsResult.from_stats(
+        mapping_app.worker_pool.stats(),
+    )
+
+
+@router.get("/mapping/cache/stats/")
+async def mapping_cache_stats(
+    mapping_app: MappingApp = Depends(get_mapping_app),
+) -> mapping_dto.CacheStatsResult:
+    return mapping_dto.CacheStatsResult.from_stats(
+        mapping_app.try_cache.stats(),
+    )
+
+
+@router.post("/mapping/strategy/init/", openapi_extra=_STRATEGY_INIT_OPENAPI)
 async def mapping_strategy_init(
-    file: UploadFile = File(...),
-    total_pixels: int = Form(...),
-    strategy: MappingStrategy = Form(...),
+    request: Request,
     mapping_app: MappingApp = Depends(get_mapping_app),
 ) -> mapping_dto.StrategyInitResult:
-    request = mapping_dto.StrategyInit(
-        total_pixels=total_pixels,
-        strategy=strategy,
-        file=MappingFileAdapter(file)
-    )
+    # The upload is streamed straight into storage instead of being spooled
+    # to a temporary file first and copied afterwards
+    try:
+        reader = MultipartStreamReader(
+            request.headers.get("content-type"), request.stream(),
+        )
+        fields, file = await reader.read_until_file()
+    except MultipartStreamException as exc:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc)) from exc
+
+    missing_errors = [
+        {
+            "type": "missing",
+            "loc": ("body", name),
+            "msg": "Field required before the file part",
+            "input": None,
+        }
+        for name in ("total_pixels", "strategy")
+        if name not in fields
+    ]
+    if file is None:
+        missing_errors.append({
+            "type": "missing",
+            "loc": ("body", "file"),
+            "msg": "Field required",
+            "input": None,
+        })
+
+    if missing_errors:
+        raise RequestValidationError(missing_errors)
+
+    try:
+        dto = mapping_dto.StrategyInit(
+            total_pixels=fields["total_pixels"],
+            strategy=fields["strategy"],
+            file=MappingFileAdapter(reader, file),
+            **{
+                name: fields[name]
+                for name in ("label_encoding",)
+                if name in fields
+            },
+            **({"roi": fields["roi"].split(",")} if fields.get("roi") else {}),
+        )
+    except ValidationError as exc:
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])}
+            for error in exc.errors(include_url=False)
+        ]) from exc
 
-    return await mapping_app.strategy_port.init(request)
+    try:
+        return await mapping_app.strategy_port.init(dto)
+    except MultipartStreamException as exc:
+        # The file part is streamed by the port, its errors surface only there
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc)) from exc
 
 
 @router.post("/mapping/strategy/read/")
@@ -118,3 +268,11 @@ async def mapping_strategy_gray_label_continue(
     mapping_app: MappingApp = Depends(get_mapping_app),
 ) -> mapping_dto.StrategyGrayLabelContinueResult:
     return await mapping_app.gray_label_strategy_port.continue_analyze(request)
+
+
+@router.post("/mapping/strategy/grayLabel/continue/many/")
+async def mapping_strategy_gray_label_continue_many(
+    request: mapping_dto.StrategyGrayLabelContinueMany,
+    mapping_app: MappingApp = Depends(get_mapping_app),
+) -> mapping_dto.StrategyGrayLabelContinueManyResult:
+    return await mapping_app.gray_label_strategy_port.continue_analyze_many(request)
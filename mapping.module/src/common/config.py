@@ -18,6 +18,10 @@ class RedisConfig(BaseModel):
     port: int = 6379
     username: str = ""
     password: str = ""
+    # Each job queue consumer holds a connection while waiting for jobs
+    max_connections: int = Field(32, ge=1)
+    # Seconds to wait for a free connection once the pool is exhausted
+    pool_timeout: float = Field(5, gt=0)
 
     def url(self, db: int = 0) -> str:
         username, password = (
@@ -39,6 +43,16 @@ class RedisConfig(BaseModel):
         return quote(value) if value else ""
 
 
+class WorkerPoolConfig(BaseModel):
+    kind: Literal["thread", "process"] = "thread"
+    max_workers: int = Field(2, ge=1)
+
+
+class JobQueueConfig(BaseModel):
+    kind: Literal["redis", "memory"] = "redis"
+    n_consumers: int = Field(1, ge=1)
+
+
 class Config(BaseSettings):
     model_config = SettingsConfigDict(
         env_prefix="cf__",
@@ -47,8 +61,12 @@ class Config(BaseSettings):
 
     service: ServiceConfig = Field(default_factory=ServiceConfig)
     redis: RedisConfig = Field(default_factory=RedisConfig)
+    worker_pool: WorkerPoolConfig = Field(default_factory=WorkerPoolConfig)
+    job_queue: JobQueueConfig = Field(default_factory=JobQueueConfig)
 
 
 _config = Config()
 service_config = _config.service
 redis_config = _config.redis
+worker_pool_config = _config.worker_pool
+job_queue_config = _config.job_queue
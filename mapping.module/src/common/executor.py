@@ -0,0 +1,93 @@
+import asyncio
+import multiprocessing
+from typing import Any, Callable, NamedTuple
+from functools import partial
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from src.common.config import WorkerPoolConfig, worker_pool_config
+
+
+class WorkerPoolStats(NamedTuple):
+    kind: str
+    max_workers: int
+    running: int
+    queued: int
+    completed: int
+    failed: int
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        *,
+        executor: Executor,
+        kind: str,
+        max_workers: int,
+    ):
+        self._executor = executor
+        self._kind = kind
+        self._max_workers = max_workers
+        self._semaphore = asyncio.Semaphore(max_workers)
+
+        self._n_running = 0
+        self._n_queued = 0
+        self._n_completed = 0
+        self._n_failed = 0
+
+    async def run[T](self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        # Calls above max_workers wait here and are reported as queued
+        self._n_queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._n_queued -= 1
+
+        self._n_running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._executor, partial(fn, *args, **kwargs),
+            )
+        except Exception:
+            self._n_failed += 1
+            raise
+        finally:
+            self._n_running -= 1
+            self._semaphore.release()
+
+        self._n_completed += 1
+
+        return result
+
+    def stats(self) -> WorkerPoolStats:
+        return WorkerPoolStats(
+            kind=self._kind,
+            max_workers=self._max_workers,
+            running=self._n_running,
+            queued=self._n_queued,
+            completed=self._n_completed,
+            failed=self._n_failed,
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def worker_pool_factory(config: WorkerPoolConfig = worker_pool_config) -> WorkerPool:
+    if config.kind == "process":
+        # Forking a process that already runs an event loop and threads is unsafe
+        executor = ProcessPoolExecutor(
+            max_workers=config.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    else:
+        executor = ThreadPoolExecutor(
+            max_workers=config.max_workers,
+            thread_name_prefix="worker-pool",
+        )
+
+    return WorkerPool(
+        executor=executor,
+        kind=config.kind,
+        max_workers=config.max_workers,
+    )
@@ -3,5 +3,18 @@ import redis.asyncio as aioredis
 from src.common.config import redis_config
 
 
-def redis_client_factory(db: int = 0) -> aioredis.Redis:
-    return aioredis.Redis.from_url(redis_config.url(db=db))
+def redis_client_factory(
+    db: int = 0,
+    *,
+    max_connections: int | None = None,
+    pool_timeout: float | None = None,
+) -> aioredis.Redis:
+    # Commands beyond max_connections wait for a free connection instead of
+    # failing with "Too many connections"
+    connection_pool = aioredis.BlockingConnectionPool.from_url(
+        redis_config.url(db=db),
+        max_connections=max_connections or redis_config.max_connections,
+        timeout=pool_timeout or redis_config.pool_timeout,
+    )
+
+    return aioredis.Redis.from_pool(connection_pool)
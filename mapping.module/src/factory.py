@@ -1,8 +1,21 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.api import fuxmas_router, include_exception_handlers
 from src.common.config import service_config
+from src.mapping import get_mapping_app
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    mapping_app = get_mapping_app()
+    await mapping_app.storage.purge_trash()
+    mapping_app.job_runner.start()
+    yield
+    await mapping_app.job_runner.stop()
+    mapping_app.worker_pool.shutdown()
 
 
 def app_factory() -> FastAPI:
@@ -12,6 +25,7 @@ def app_factory() -> FastAPI:
         version=service_config.version,
         docs_url="/docs/",
         redoc_url=None,
+        lifespan=_lifespan,
     )
     app.add_middleware(
         CORSMiddleware,
@@ -1,14 +1,19 @@
 from typing import NamedTuple
 from datetime import timedelta
 
+from src.common.config import job_queue_config
 from src.common.redis import redis_client_factory
-from src.mapping.interfaces import IStorage, IRepository, IExposeFilePort
+from src.common.executor import WorkerPool, worker_pool_factory
+from src.mapping.interfaces import IStorage, IRepository, IExposeFilePort, IJobQueue
 from src.mapping.enums import Strategy
-from src.mapping.graylabel import GrayLabelStrategyPort
+from src.mapping.graylabel import GrayLabelStrategyPort, GrayLabelStrategyPortConfig
 from src.mapping.repository import RedisRepository
+from src.mapping.queue import RedisJobQueue, RedisJobQueueConfig, MemoryJobQueue
+from src.mapping.jobs import StrategyJobRunner, StrategyJobRunnerConfig
 from src.mapping.strategy import StrategyPort, StrategyPortConfig
 from src.mapping.storage import FilesystemStorage, FilesystemStorageConfig
 from src.mapping.expose_file import ExposeFilePort, ExposeFilePortConfig
+from pkg.cache import LRUCache
 
 
 class MappingApp(NamedTuple):
@@ -17,9 +22,13 @@ class MappingApp(NamedTuple):
     expose_file_port: IExposeFilePort
     strategy_port: StrategyPort
     gray_label_strategy_port: GrayLabelStrategyPort
+    worker_pool: WorkerPool
+    job_runner: StrategyJobRunner
+    try_cache: LRUCache
 
 
 _redis_client = redis_client_factory(db=0)
+_worker_pool = worker_pool_factory()
 _filesystem_storage = FilesystemStorage(
     config=FilesystemStorageConfig(
         path="storage/",
@@ -28,15 +37,30 @@ _filesystem_storage = FilesystemStorage(
 _redis_repository = RedisRepository(
     client=_redis_client,
 )
+_job_queue: IJobQueue = (
+    RedisJobQueue(
+        config=RedisJobQueueConfig(),
+        client=_redis_client,
+    )
+    if job_queue_config.kind == "redis" else MemoryJobQueue()
+)
 _expose_file_port = ExposeFilePort(
     config=ExposeFilePortConfig(),
     storage=_filesystem_storage,
     repository=_redis_repository,
 )
+_try_cache = LRUCache(
+    max_entries=128,
+    max_size=512 * 1024 * 1024,
+    ttl=timedelta(minutes=10).total_seconds(),
+)
 _gray_label_strategy_port = GrayLabelStrategyPort(
+    config=GrayLabelStrategyPortConfig(),
     storage=_filesystem_storage,
     repository=_redis_repository,
     expose_file_port=_expose_file_port,
+    worker_pool=_worker_pool,
+    try_cache=_try_cache,
 )
 _strategy_port = StrategyPort(
     config=StrategyPortConfig(
@@ -44,16 +68,27 @@ _strategy_port = StrategyPort(
     ),
     storage=_filesystem_storage,
     repository=_redis_repository,
+    job_queue=_job_queue,
     strategies={
         Strategy.GRAY_LABEL: _gray_label_strategy_port,
     }
 )
+_job_runner = StrategyJobRunner(
+    config=StrategyJobRunnerConfig(
+        n_consumers=job_queue_config.n_consumers,
+    ),
+    job_queue=_job_queue,
+    strategy_port=_strategy_port,
+)
 _mapping_app = MappingApp(
     storage=_filesystem_storage,
     repository=_redis_repository,
     expose_file_port=_expose_file_port,
     strategy_port=_strategy_port,
     gray_label_strategy_port=_gray_label_strategy_port,
+    worker_pool=_worker_pool,
+    job_runner=_job_runner,
+    try_cache=_try_cache,
 )
 
 
@@ -2,9 +2,14 @@ from uuid import UUID
 
 from pydantic import BaseModel, Field, ConfigDict
 
+from src.common.executor import WorkerPoolStats
+from pkg.cache import LRUCacheStats
+from pkg.snake_case import from_pascal_to_snake_case
 from src.mapping.enums import Strategy, Status
 from src.mapping.interfaces import IFile
-from src.mapping.entity import StrategyEntity
+from src.mapping.entity import StrategyEntity, PositionT, BoxT
+from src.mapping.exceptions import MappingException
+from pkg.graylabel import LabelEncoding, LabelThreshold, PixelDetector
 
 
 class StrategyInit(BaseModel):
@@ -15,6 +20,8 @@ class StrategyInit(BaseModel):
     total_pixels: int
     strategy: Strategy
     file: IFile
+    label_encoding: LabelEncoding = LabelEncoding.GRAY
+    roi: BoxT | None = None
 
 
 class StrategyInitResult(BaseModel):
@@ -30,7 +37,11 @@ class StrategyReadResult(BaseModel):
     status: Status
     total_pixels: int
     strategy: Strategy
-    positions: list[tuple[int, int]]
+    label_encoding: LabelEncoding
+    positions: list[PositionT]
+    stage: str | None
+    error: str | None
+    crop_box: BoxT | None
 
     @classmethod
     def from_entity(cls, entity: StrategyEntity):
@@ -39,7 +50,11 @@ class StrategyReadResult(BaseModel):
             status=entity.status,
             total_pixels=entity.total_pixels,
             strategy=entity.strategy,
+            label_encoding=entity.label_encoding,
             positions=entity.positions,
+            stage=entity.stage,
+            error=entity.error,
+            crop_box=entity.crop_box,
         )
 
 
@@ -50,6 +65,9 @@ class StrategyGrayLabelTry(BaseModel):
         score_filter_margin: int = 10
         min_distance: int = Field(14, ge=10, le=30)
         quality_levels: float = Field(0.02, ge=0.01, le=0.3)
+        subpixel: bool = False
+        detector: PixelDetector = PixelDetector.CORNERS
+        roi: BoxT | None = None
 
     id: UUID
     options: Options = Field(default_factory=Options)
@@ -57,13 +75,67 @@ class StrategyGrayLabelTry(BaseModel):
 
 class StrategyGrayLabelTryResult(BaseModel):
     pixels_file_id: UUID
-    pixels_positions: list[tuple[int, int]]
+    pixels_positions: list[PositionT]
 
 
 class StrategyGrayLabelContinue(BaseModel):
+    class Options(BaseModel):
+        threshold: LabelThreshold = LabelThreshold.BASE
+
     id: UUID
-    pixels_positions: list[tuple[int, int]]
+    pixels_positions: list[PositionT]
+    options: Options = Field(default_factory=Options)
 
 
 class StrategyGrayLabelContinueResult(BaseModel):
-    positions: list[tuple[int, int]]
+    positions: list[PositionT]
+    confidences: list[float]
+
+
+class StrategyGrayLabelContinueMany(BaseModel):
+    items: list[StrategyGrayLabelContinue] = Field(min_length=1, max_length=32)
+
+
+class MappingError(BaseModel):
+    type: str
+    msg: str
+
+    @classmethod
+    def from_exc(cls, exc: MappingException):
+        return cls(
+            type=from_pascal_to_snake_case(type(exc).__name__),
+            msg=str(exc),
+        )
+
+
+class StrategyGrayLabelContinueManyResult(BaseModel):
+    class Item(BaseModel):
+        id: UUID
+        result: StrategyGrayLabelContinueResult | None = None
+        error: MappingError | None = None
+
+    items: list[Item]
+
+
+class WorkerPoolStatsResult(BaseModel):
+    kind: str
+    max_workers: int
+    running: int
+    queued: int
+    completed: int
+    failed: int
+
+    @classmethod
+    def from_stats(cls, stats: WorkerPoolStats):
+        return cls(**stats._asdict())
+
+
+class CacheStatsResult(BaseModel):
+    entries: int
+    size: int
+    hits: int
+    misses: int
+
+    @classmethod
+    def from_stats(cls, stats: LRUCacheStats):
+        return cls(**stats._asdict())
@@ -3,6 +3,14 @@ from dataclasses import dataclass, field
 from pathlib import Path
 
 from src.mapping.enums import Strategy, Status
+from pkg.graylabel import LabelEncoding
+
+
+# Pixel positions are integer, or float when refined to subpixel
+type PositionT = tuple[int, int] | tuple[float, float]
+
+# x, y, width, height
+type BoxT = tuple[int, int, int, int]
 
 
 @dataclass(kw_only=True)
@@ -11,13 +19,24 @@ class StrategyEntity:
     status: Status
     total_pixels: int
     strategy: Strategy
-    positions: list[tuple[int, int]]
+    positions: list[PositionT]
+    label_encoding: LabelEncoding = LabelEncoding.GRAY
+    # Region of the video frames kept by init, in video coordinates
+    crop_box: BoxT | None = None
+    stage: str | None = None
+    error: str | None = None
 
     @property
     def path_dir(self) -> Path:
         return Path(str(self.id))
 
 
+@dataclass(kw_only=True)
+class StrategyInitJob:
+    entity_id: UUID
+    downloaded_file_path: Path
+
+
 @dataclass(kw_only=True)
 class ExposedFileEntity:
     file_path: Path
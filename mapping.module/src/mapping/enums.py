@@ -8,6 +8,9 @@ class Strategy(StrEnum):
 
 class Status(StrEnum):
     QUEUED = auto()
+    PROCESSING = auto()
+    READY = auto()
+    FAILED = auto()
     MAPPED = auto()
 
 
@@ -17,6 +20,11 @@ class GrayLabelStatus(StrEnum):
     MAPPED = auto()
 
 
+class FrameStoreFormat(StrEnum):
+    JPEG = auto()
+    NPY = auto()
+
+
 class FileMIME(StrEnum):
     MP4 = "video/mp4"
     MOV = "video/quicktime"
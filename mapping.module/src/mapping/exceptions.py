@@ -23,6 +23,10 @@ class StrategyNotFound(MappingException):
     _default_msg = "The specified strategy is not found."
 
 
+class StrategyInitFailed(MappingException):
+    _default_msg = "Failed to initialize the specified strategy."
+
+
 class StrategyUnapplicable(MappingException):
     _default_msg = "The specified strategy is unbailable to method used."
 
@@ -1,3 +1,4 @@
+import asyncio
 from typing import NamedTuple
 from uuid import UUID
 from pathlib import Path
@@ -28,15 +29,31 @@ class ExposeFilePort:
         self._repository = repository
 
     async def expose(self, file_path: Path) -> tuple[bool, UUID | None]:
-        if not await self._storage.exists(file_path):
-            return False, None
+        result, = await self.expose_many([file_path])
 
-        entity = ExposedFileEntity(file_path=file_path)
-        is_ok = await self._repository.save_exposed_file(
-            entity, ttl=self._config.ttl
+        return result
+
+    async def expose_many(self, file_paths: list[Path]) -> list[tuple[bool, UUID | None]]:
+        # Files are checked concurrently, keys are set in one round trip
+        exists = await asyncio.gather(*(
+            self._storage.exists(file_path) for file_path in file_paths
+        ))
+        entities = [
+            ExposedFileEntity(file_path=file_path) if is_existing else None
+            for file_path, is_existing in zip(file_paths, exists)
+        ]
+        existing_entities = [entity for entity in entities if entity is not None]
+        saved = iter(
+            await self._repository.save_exposed_files(
+                existing_entities, ttl=self._config.ttl,
+            )
+            if existing_entities else []
         )
 
-        return is_ok, entity.id
+        return [
+            (next(saved), entity.id) if entity is not None else (False, None)
+            for entity in entities
+        ]
 
     async def get_path(self, entity_id: UUID) -> Path:
         entity = await self._repository.get_exposed_file(entity_id)
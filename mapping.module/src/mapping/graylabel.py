@@ -1,50 +1,232 @@
+import asyncio
+import math
+from typing import NamedTuple
 from pathlib import Path
 from uuid import UUID
 
-from src.mapping.enums import FileMIME, Strategy, Status
+import cv2
+import numpy as np
+
+from src.common.executor import WorkerPool
+from src.mapping.enums import (
+    FileMIME,
+    FrameStoreFormat,
+    Strategy,
+    Status,
+    GrayLabelStatus,
+)
 from src.mapping.interfaces import IStorage, IRepository, IExposeFilePort
-from src.mapping.entity import StrategyEntity
+from src.mapping.entity import StrategyEntity, PositionT, BoxT
 from src.mapping.dto import (
    StrategyGrayLabelTry,
    StrategyGrayLabelTryResult,
    StrategyGrayLabelContinue,
-   StrategyGrayLabelContinueResult
+   StrategyGrayLabelContinueResult,
+   StrategyGrayLabelContinueMany,
+   StrategyGrayLabelContinueManyResult,
+   MappingError,
 )
 from src.mapping.exceptions import (
+    MappingException,
     StrategyNotFound,
     StrategyUnapplicable,
     GrayLabelMappingException,
 )
 from pkg.file import format_fullname, join_path_parts
+from pkg.cache import LRUCache
 from pkg.graylabel import (
+    ClipMode,
+    ClipBackend,
+    FrameAverage,
+    LabelEncoding,
+    LabelThreshold,
     MappingFunctionException,
     clip_video,
     encode_frame,
     decode_frame,
+    get_value_channel,
     darken_tone,
     detect_pixels,
+    downscale_frame,
+    upscale_pixels,
     score_pixels,
-    read_labels,
-    get_n_unique_frames_required,
+    read_labels_with_confidence,
+    get_n_pattern_frames,
+    get_n_bits_per_frame,
+    get_labels_box,
+    clamp_box,
+    crop_frame,
+    create_frame_stack,
+    open_frame_stack,
 )
 
 
 _FRAMES_DIR = "frames"
 _FRAME_EXT = ".jpg"
 _BASE_FRAME_FULLNAME = f"0{_FRAME_EXT}"
+_FRAME_STACK_FULLNAME = "stack.npy"
+
+
+# Stages below are executed by the worker pool, so they have to stay
+# module-level (picklable) and must not touch storage or repository.
+
+class _ClipOptions(NamedTuple):
+    n_pixels: int
+    pattern_interval: float
+    clip_mode: ClipMode
+    clip_backend: ClipBackend
+    encoding: LabelEncoding
+    crop_box: BoxT | None
+    luma_frames: bool
+    n_average_frames: int
+    frame_average: FrameAverage
+
+
+def _clip_cropped_frames(file_path: Path, options: _ClipOptions):
+    crop_box = options.crop_box
+    for frame_idx, frame in clip_video(
+        file_path=file_path,
+        n_pixels=options.n_pixels,
+        pattern_interval=options.pattern_interval,
+        mode=options.clip_mode,
+        backend=options.clip_backend,
+        encoding=options.encoding,
+        n_average_frames=options.n_average_frames,
+        average=options.frame_average,
+    ):
+        if crop_box is not None:
+            crop_box = clamp_box(crop_box, frame.shape)
+            frame = crop_frame(frame, crop_box)
+
+        yield frame_idx, frame, crop_box
+
+
+def _to_label_frame(frame, options: _ClipOptions):
+    # Labels are read from brightness only, unless bits are carried by
+    # colors; the base frame stays in color for preview, detection and scoring
+    if options.luma_frames and get_n_bits_per_frame(options.encoding) == 1:
+        return get_value_channel(frame)
+
+    return frame
+
+
+def _clip_frames(
+    file_path: Path,
+    options: _ClipOptions,
+) -> tuple[list[tuple[int, bytes, str]], BoxT | None]:
+    clipped_frames, crop_box = [], options.crop_box
+    for frame_idx, frame, crop_box in _clip_cropped_frames(file_path, options):
+        if frame_idx > 0:
+            frame = _to_label_frame(frame, options)
+
+        clipped_frames.append((frame_idx, *encode_frame(frame, _FRAME_EXT)))
+
+    return clipped_frames, crop_box
+
+
+def _clip_frames_stack(
+    file_path: Path,
+    stack_path: Path,
+    options: _ClipOptions,
+) -> tuple[list[tuple[int, bytes, str]], BoxT | None]:
+    # Frames go raw into one memory-mappable stack, only the base frame
+    # is encoded to be exposed as a preview
+    stack_path.parent.mkdir(parents=True, exist_ok=True)
+    n_frames = get_n_pattern_frames(options.n_pixels, options.encoding) + 1
+
+    stack, base_frame, crop_box = None, None, options.crop_box
+    for frame_idx, frame, crop_box in _clip_cropped_frames(file_path, options):
+        if stack is None:
+            base_frame = frame
+            stack = create_frame_stack(
+                stack_path, n_frames, _to_label_frame(frame, options).shape,
+            )
+
+        stack[frame_idx] = _to_label_frame(frame, options)
+
+    stack.flush()
+
+    return [(0, *encode_frame(base_frame, _FRAME_EXT))], crop_box
+
+
+def _decode_base_frame(source: bytes | Path):
+    if isinstance(source, Path):
+        base_frame = open_frame_stack(source)[0]
+        # Luma-only stacks don't keep the colors, the preview has them
+        return np.array(base_frame) if base_frame.ndim == 3 else None
+
+    return decode_frame(source)
+
+
+def _decode_label_frame(buffer: bytes, crop_box: BoxT | None = None):
+    # Luma-only frames are decoded straight to their single channel
+    frame = decode_frame(buffer, cv2.IMREAD_UNCHANGED)
+    if crop_box is None:
+        return frame
+
+    # Copied, so the full decoded frame is released right away
+    return crop_frame(frame, crop_box).copy()
+
+
+def _downscale_frame(frame, max_resolution: int):
+    frame, _ = downscale_frame(frame, max_resolution)
+    return frame
+
+
+def _darken_tone(frame):
+    # darken_tone is a closure, which can't be pickled for a process pool
+    return darken_tone(frame)
+
+
+def _read_stack_labels(
+    stack_path: Path,
+    n_pixels: int,
+    pixels: list[PositionT],
+    encoding: LabelEncoding,
+    threshold_mode: LabelThreshold,
+) -> dict[int, tuple[PositionT, float]]:
+    # Only the sampled rings are paged in from the memory-mapped stack
+    return read_labels_with_confidence(
+        frames=list(open_frame_stack(stack_path)),
+        n_pixels=n_pixels,
+        pixels=pixels,
+        encoding=encoding,
+        threshold_mode=threshold_mode,
+    )
+
+
+class GrayLabelStrategyPortConfig(NamedTuple):
+    pattern_interval: float = 2
+    clip_mode: ClipMode = ClipMode.SEQUENTIAL
+    clip_backend: ClipBackend = ClipBackend.OPENCV
+    frame_store_format: FrameStoreFormat = FrameStoreFormat.JPEG
+    frame_load_concurrency: int = 4
+    # Pattern frames are stored as their single brightness (V) channel
+    luma_frames: bool = False
+    # Consecutive frames around each pattern reduced into its stored frame
+    n_average_frames: int = 1
+    frame_average: FrameAverage = FrameAverage.MEAN
+    # Longest side candidates are detected at, None detects at native size
+    max_working_resolution: int | None = 1920
 
 
 class GrayLabelStrategyPort:
     def __init__(
         self,
         *,
+        config: GrayLabelStrategyPortConfig,
         storage: IStorage,
         repository: IRepository,
         expose_file_port: IExposeFilePort,
+        worker_pool: WorkerPool,
+        try_cache: LRUCache,
     ):
+        self._config = config
         self._storage = storage
         self._repository = repository
         self._expose_file_port = expose_file_port
+        self._worker_pool = worker_pool
+        self._try_cache = try_cache
 
     def is_supported_mime(self, mime: FileMIME) -> bool:
         return mime in (FileMIME.MP4, FileMIME.MOV, FileMIME.AVI)
@@ -54,63 +236,86 @@ class GrayLabelStrategyPort:
         entity: StrategyEntity,
         downloaded_file_path: Path,
     ):
+        file_path = self._storage.get_local_filesystem_path(downloaded_file_path)
+        clip_options = _ClipOptions(
+            n_pixels=entity.total_pixels,
+            pattern_interval=self._config.pattern_interval,
+            clip_mode=self._config.clip_mode,
+            clip_backend=self._config.clip_backend,
+            encoding=entity.label_encoding,
+            crop_box=entity.crop_box,
+            luma_frames=self._config.luma_frames,
+            n_average_frames=self._config.n_average_frames,
+            frame_average=self._config.frame_average,
+        )
+
         try:
-            for frame_idx, frame, in clip_video(
-                file_path=self._storage.get_local_filesystem_path(
-                    downloaded_file_path,
-                ),
-                n_pixels=entity.total_pixels,
-                pattern_interval=2,
-            ):
-                buffer, ext = encode_frame(frame, _FRAME_EXT)
-                await self._storage.save_buffer(
-                    file_path=join_path_parts(
-                        entity.path_dir, _FRAMES_DIR, format_fullname(frame_idx, ext),
+            if self._config.frame_store_format == FrameStoreFormat.NPY:
+                clipped_frames, crop_box = await self._worker_pool.run(
+                    _clip_frames_stack,
+                    file_path=file_path,
+                    stack_path=self._storage.get_local_filesystem_path(
+                        self._get_frame_stack_path(entity),
                     ),
-                    buffer=buffer,
+                    options=clip_options,
+                )
+            else:
+                clipped_frames, crop_box = await self._worker_pool.run(
+                    _clip_frames, file_path=file_path, options=clip_options,
                 )
         except MappingFunctionException as exc:
             await self._storage.delete(entity.path_dir)
             raise GrayLabelMappingException.from_exc(exc) from exc
 
+        for frame_idx, buffer, ext in clipped_frames:
+            await self._storage.save_buffer(
+                file_path=join_path_parts(
+                    entity.path_dir, _FRAMES_DIR, format_fullname(frame_idx, ext),
+                ),
+                buffer=buffer,
+            )
+
         await self._storage.delete(downloaded_file_path)
+        entity.crop_box = crop_box
+        entity.stage = GrayLabelStatus.CLIPPED
 
     async def try_analyze(
         self, dto: StrategyGrayLabelTry,
     ) -> StrategyGrayLabelTryResult:
         entity = await self._get_entity(dto.id)
+        options = dto.options
         frame_file_path = join_path_parts(
             entity.path_dir, _FRAMES_DIR, _BASE_FRAME_FULLNAME,
         )
-        exists, buffer = await self._storage.read_buffer(frame_file_path)
-        if not exists:
-            raise GrayLabelMappingException.not_initialized()
 
-        original_frame = decode_frame(buffer)
-        frame = original_frame.copy()
-        if dto.options.use_tone_filter:
-            frame = darken_tone(frame)
+        try:
+            pixels = await self._detect_candidates(entity, options)
+        except MappingFunctionException as exc:
+            raise GrayLabelMappingException.from_exc(exc) from exc
 
-        pixels = detect_pixels(
-            frame=frame,
-            n_pixels=(
-                entity.total_pixels + dto.options.score_filter_margin
-                if dto.options.use_score_filter else entity.total_pixels
-            ),
-            quality_levels=dto.options.quality_levels,
-            min_distance=dto.options.min_distance,
-        )
         if len(pixels) < entity.total_pixels:
             raise GrayLabelMappingException.no_pixel_targets()
 
-        if dto.options.use_score_filter:
-            pixels = score_pixels(
-                frame=original_frame,
+        if options.use_score_filter:
+            pixels = await self._worker_pool.run(
+                score_pixels,
+                frame=await self._load_base_frame(entity),
                 n_pixels=entity.total_pixels,
                 candidates=pixels,
             )
 
-        is_exposed, file_id = await self._expose_file_port.expose(frame_file_path)
+        # Both keys are written concurrently, over separate pool connections
+        pending = [self._expose_file_port.expose(frame_file_path)]
+        if entity.stage == GrayLabelStatus.CLIPPED:
+            # The entity read above is stale by now, a continue may have
+            # been saved while the pixels were being detected
+            pending.append(self._repository.set_stage(
+                entity.id,
+                GrayLabelStatus.ANALYZED,
+                expected_stage=GrayLabelStatus.CLIPPED,
+            ))
+
+        (is_exposed, file_id), *_ = await asyncio.gather(*pending)
         if not is_exposed:
             raise GrayLabelMappingException()
 
@@ -123,47 +328,279 @@ class GrayLabelStrategyPort:
         self, dto: StrategyGrayLabelContinue
     ) -> StrategyGrayLabelContinueResult:
         entity = await self._get_entity(dto.id)
+        result = await self._map_positions(entity, dto)
+        await self._repository.save(entity)
+
+        return result
+
+    async def continue_analyze_many(
+        self, dto: StrategyGrayLabelContinueMany
+    ) -> StrategyGrayLabelContinueManyResult:
+        # Entities are read and saved in one round trip each, labels of all
+        # items are decoded concurrently by the worker pool
+        entities = await self._repository.get_many([item.id for item in dto.items])
+
+        async def _continue_item(entity: StrategyEntity | None, item: StrategyGrayLabelContinue):
+            item_result = StrategyGrayLabelContinueManyResult.Item(id=item.id)
+            try:
+                item_result.result = await self._map_positions(
+                    self._check_entity(entity), item,
+                )
+            except MappingException as exc:
+                item_result.error = MappingError.from_exc(exc)
+
+            return item_result
+
+        items = await asyncio.gather(*(
+            _continue_item(entity, item)
+            for entity, item in zip(entities, dto.items)
+        ))
+
+        mapped_entities = [
+            entity for entity, item in zip(entities, items)
+            if item.error is None
+        ]
+        if mapped_entities:
+            await self._repository.save_many(mapped_entities)
+
+        return StrategyGrayLabelContinueManyResult(items=items)
+
+    async def _map_positions(
+        self,
+        entity: StrategyEntity,
+        dto: StrategyGrayLabelContinue,
+    ) -> StrategyGrayLabelContinueResult:
+        stack_path = self._get_frame_stack_path(entity)
+        try:
+            if await self._storage.exists(stack_path):
+                mapped_position = await self._worker_pool.run(
+                    _read_stack_labels,
+                    stack_path=self._storage.get_local_filesystem_path(stack_path),
+                    n_pixels=entity.total_pixels,
+                    pixels=dto.pixels_positions,
+                    encoding=entity.label_encoding,
+                    threshold_mode=dto.options.threshold,
+                )
+            else:
+                mapped_position = await self._read_jpeg_labels(
+                    entity, dto.pixels_positions, dto.options.threshold,
+                )
+        except MappingFunctionException as exc:
+            raise GrayLabelMappingException.from_exc(exc) from exc
+
+        positions, confidences = [], []
+        for _, (coord, confidence) in sorted(mapped_position.items()):
+            positions.append(coord)
+            confidences.append(confidence)
+
+        if len(positions) != entity.total_pixels:
+            raise GrayLabelMappingException.failed_to_read_labels()
+
+        entity.status = Status.MAPPED
+        entity.stage = GrayLabelStatus.MAPPED
+        entity.positions = positions
+
+        return StrategyGrayLabelContinueResult(
+            positions=entity.positions,
+            confidences=confidences,
+        )
+
+    async def _read_jpeg_labels(
+        self,
+        entity: StrategyEntity,
+        pixels: list[PositionT],
+        threshold_mode: LabelThreshold,
+    ) -> dict[int, tuple[PositionT, float]]:
+        semaphore = asyncio.Semaphore(self._config.frame_load_concurrency)
+
+        # Only the region around the pixels is kept after decoding, so much
+        # smaller frames are held in memory and sent to the worker pool
+        labels_box = get_labels_box(pixels) if pixels else (0, 0, 0, 0)
+        crop_x, crop_y = max(labels_box[0], 0), max(labels_box[1], 0)
 
         async def _load_frame(frame_idx: int):
             frame_file_path = join_path_parts(
                 entity.path_dir, _FRAMES_DIR, format_fullname(frame_idx, _FRAME_EXT),
             )
-            is_loaded, buffer = await self._storage.read_buffer(frame_file_path)
-            if not is_loaded:
-                raise GrayLabelMappingException.not_initialized()
+            async with semaphore:
+                is_loaded, buffer = await self._storage.read_buffer(frame_file_path)
+                if not is_loaded:
+                    raise GrayLabelMappingException.not_initialized()
 
-            return decode_frame(buffer)
+                # cv2.imdecode releases the GIL, so threads decode in parallel
+                return await asyncio.to_thread(
+                    _decode_label_frame, buffer, labels_box if pixels else None,
+                )
 
-        n_frames_to_load = get_n_unique_frames_required(entity.total_pixels)
-        frames = [
-            await _load_frame(frame_idx)
+        n_frames_to_load = get_n_pattern_frames(
+            entity.total_pixels, entity.label_encoding,
+        )
+        frames = await asyncio.gather(*(
+            _load_frame(frame_idx)
             for frame_idx in range(n_frames_to_load + 1)
-        ]
+        ))
 
-        mapped_position = read_labels(
+        cropped_pixels = {
+            (x - crop_x, y - crop_y): (x, y) for x, y in pixels
+        }
+        mapped_position = await self._worker_pool.run(
+            read_labels_with_confidence,
             frames=frames,
             n_pixels=entity.total_pixels,
-            pixels=dto.pixels_positions
+            pixels=list(cropped_pixels),
+            encoding=entity.label_encoding,
+            threshold_mode=threshold_mode,
         )
-        positions = [
-            coord for _, coord in sorted(mapped_position.items())
-        ]
 
-        if len(positions) != entity.total_pixels:
-            raise GrayLabelMappingException.failed_to_read_labels()
+        return {
+            label: (cropped_pixels[coord], confidence)
+            for label, (coord, confidence) in mapped_position.items()
+        }
 
-        entity.status = Status.MAPPED
-        entity.positions = positions
-        await self._repository.save(entity)
+    # Users re-run try with tweaked options, so every stage is cached by the
+    # options it depends on and only the changed ones are recomputed
+
+    async def _load_base_frame(self, entity: StrategyEntity):
+        cache_key = (entity.id, "frame")
+        frame = self._try_cache.get(cache_key)
+        if frame is not None:
+            return frame
+
+        frame = None
+        stack_path = self._get_frame_stack_path(entity)
+        if await self._storage.exists(stack_path):
+            frame = await self._worker_pool.run(
+                _decode_base_frame,
+                self._storage.get_local_filesystem_path(stack_path),
+            )
+
+        if frame is None:
+            exists, buffer = await self._storage.read_buffer(
+                join_path_parts(entity.path_dir, _FRAMES_DIR, _BASE_FRAME_FULLNAME),
+            )
+            if not exists:
+                raise GrayLabelMappingException.not_initialized()
+
+            frame = await self._worker_pool.run(_decode_base_frame, buffer)
+
+        self._try_cache.set(cache_key, frame)
+
+        return frame
+
+    async def _load_working_frame(self, entity: StrategyEntity):
+        frame = await self._load_base_frame(entity)
+        if self._config.max_working_resolution is None:
+            return frame
+
+        cache_key = (entity.id, "working")
+        working_frame = self._try_cache.get(cache_key)
+        if working_frame is not None:
+            return working_frame
+
+        working_frame = await self._worker_pool.run(
+            _downscale_frame, frame, self._config.max_working_resolution,
+        )
+        self._try_cache.set(cache_key, working_frame)
 
-        return StrategyGrayLabelContinueResult(positions=entity.positions)
+        return working_frame
+
+    async def _load_toned_frame(self, entity: StrategyEntity):
+        cache_key = (entity.id, "tone")
+        frame = self._try_cache.get(cache_key)
+        if frame is not None:
+            return frame
+
+        frame = await self._worker_pool.run(
+            _darken_tone, await self._load_working_frame(entity),
+        )
+        self._try_cache.set(cache_key, frame)
+
+        return frame
+
+    async def _detect_candidates(
+        self,
+        entity: StrategyEntity,
+        options: StrategyGrayLabelTry.Options,
+    ) -> list[PositionT]:
+        n_pixels = (
+            entity.total_pixels + options.score_filter_margin
+            if options.use_score_filter else entity.total_pixels
+        )
+        cache_key = (
+            entity.id,
+            "detect",
+            options.use_tone_filter,
+            n_pixels,
+            options.quality_levels,
+            options.min_distance,
+            options.subpixel,
+            options.detector,
+            options.roi,
+        )
+        pixels = self._try_cache.get(cache_key)
+        if pixels is not None:
+            return pixels
+
+        base_frame = await self._load_base_frame(entity)
+        frame = await (
+            self._load_toned_frame(entity)
+            if options.use_tone_filter else self._load_working_frame(entity)
+        )
+        # Detection runs on the downscaled working frame, found candidates
+        # are refined back at full resolution
+        scale = frame.shape[1] / base_frame.shape[1]
+
+        roi_x, roi_y = 0, 0
+        if options.roi is not None:
+            x, y, width, height = options.roi
+            working_roi = (
+                int(x * scale),
+                int(y * scale),
+                math.ceil(width * scale),
+                math.ceil(height * scale),
+            )
+            roi_x, roi_y, *_ = clamp_box(working_roi, frame.shape)
+            frame = crop_frame(frame, working_roi)
+
+        pixels = await self._worker_pool.run(
+            detect_pixels,
+            frame=frame,
+            n_pixels=n_pixels,
+            quality_levels=options.quality_levels,
+            min_distance=max(round(options.min_distance * scale), 1),
+            subpixel=options.subpixel and scale == 1,
+            detector=options.detector,
+        )
+        if roi_x or roi_y:
+            pixels = [(x + roi_x, y + roi_y) for x, y in pixels]
+
+        if scale < 1:
+            pixels = await self._worker_pool.run(
+                upscale_pixels,
+                frame=base_frame,
+                pixels=pixels,
+                scale=scale,
+                subpixel=options.subpixel,
+            )
+
+        self._try_cache.set(cache_key, pixels)
+
+        return pixels
+
+    def _get_frame_stack_path(self, entity: StrategyEntity) -> Path:
+        return join_path_parts(entity.path_dir, _FRAMES_DIR, _FRAME_STACK_FULLNAME)
 
     async def _get_entity(self, entity_id: UUID) -> StrategyEntity:
-        entity = await self._repository.get(entity_id)
+        return self._check_entity(await self._repository.get(entity_id))
+
+    def _check_entity(self, entity: StrategyEntity | None) -> StrategyEntity:
         if entity is None:
             raise StrategyNotFound()
 
         if entity.strategy != Strategy.GRAY_LABEL:
             raise StrategyUnapplicable()
 
+        if entity.status not in (Status.READY, Status.MAPPED):
+            raise GrayLabelMappingException.not_initialized()
+
         return entity
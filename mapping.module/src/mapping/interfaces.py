@@ -3,7 +3,7 @@ from pathlib import Path
 from uuid import UUID
 
 from src.mapping.enums import FileMIME
-from src.mapping.entity import StrategyEntity, ExposedFileEntity
+from src.mapping.entity import StrategyEntity, ExposedFileEntity, StrategyInitJob
 
 
 @runtime_checkable
@@ -28,24 +28,48 @@ class IStorage(Protocol):
 
     async def delete(self, path: Path) -> bool: ...
 
+    async def purge_trash(self) -> int: ...
+
     def get_local_filesystem_path(path: Path) -> Path: ...
 
 
 class IRepository(Protocol):
     async def save(self, entity: StrategyEntity, ttl: int | None = None) -> bool: ...
 
+    async def save_many(
+        self, entities: list[StrategyEntity], ttl: int | None = None,
+    ) -> list[bool]: ...
+
+    async def set_stage(
+        self, entity_id: UUID, stage: str, *, expected_stage: str | None,
+    ) -> bool: ...
+
     async def get(self, entity_id: UUID) -> StrategyEntity | None: ...
 
+    async def get_many(self, entity_ids: list[UUID]) -> list[StrategyEntity | None]: ...
+
     async def save_exposed_file(self, entity: ExposedFileEntity, ttl: int = 0) -> bool: ...
 
+    async def save_exposed_files(
+        self, entities: list[ExposedFileEntity], ttl: int = 0,
+    ) -> list[bool]: ...
+
     async def get_exposed_file(self, entity_id: UUID) -> ExposedFileEntity | None: ...
 
     async def delete_exposed_file(self, entity_id: UUID) -> bool: ...
 
 
+class IJobQueue(Protocol):
+    async def push(self, job: StrategyInitJob) -> None: ...
+
+    async def pop(self, timeout: float) -> StrategyInitJob | None: ...
+
+
 class IExposeFilePort(Protocol):
     async def expose(self, file_path: Path) -> tuple[bool, UUID | None]: ...
 
+    async def expose_many(self, file_paths: list[Path]) -> list[tuple[bool, UUID | None]]: ...
+
     async def get_path(self, entity_id: UUID) -> Path: ...
 
 
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from typing import NamedTuple
+
+from src.mapping.interfaces import IJobQueue
+from src.mapping.strategy import StrategyPort
+
+
+_logger = logging.getLogger(__name__)
+
+
+class StrategyJobRunnerConfig(NamedTuple):
+    n_consumers: int = 1
+    poll_timeout: float = 1.0
+    # Delay before polling again after the queue failed (connection lost)
+    error_backoff: float = 1.0
+
+
+class StrategyJobRunner:
+    def __init__(
+        self,
+        *,
+        config: StrategyJobRunnerConfig,
+        job_queue: IJobQueue,
+        strategy_port: StrategyPort,
+    ):
+        self._config = config
+        self._job_queue = job_queue
+        self._strategy_port = strategy_port
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._consume())
+            for _ in range(self._config.n_consumers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                job = await self._job_queue.pop(timeout=self._config.poll_timeout)
+            except Exception:
+                _logger.exception("Failed to pop init job from the queue.")
+                await asyncio.sleep(self._config.error_backoff)
+                continue
+
+            if job is None:
+                continue
+
+            try:
+                await self._strategy_port.process(job)
+            except Exception:
+                _logger.exception("Failed to process init job of %s strategy.", job.entity_id)
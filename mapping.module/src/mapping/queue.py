@@ -0,0 +1,66 @@
+import asyncio
+from uuid import UUID
+from typing import NamedTuple
+from pathlib import Path
+
+import redis.asyncio as aioredis
+from msgspec import msgpack
+
+from src.mapping.entity import StrategyInitJob
+
+
+def _map_job_to_redis(job: StrategyInitJob) -> bytes:
+    return msgpack.encode({
+        "entity_id": str(job.entity_id),
+        "downloaded_file_path": str(job.downloaded_file_path),
+    })
+
+
+def _map_redis_to_job(data: bytes) -> StrategyInitJob:
+    decoded_data = msgpack.decode(data)
+
+    return StrategyInitJob(
+        entity_id=UUID(decoded_data["entity_id"]),
+        downloaded_file_path=Path(decoded_data["downloaded_file_path"]),
+    )
+
+
+class RedisJobQueueConfig(NamedTuple):
+    name: str = "jobs:strategy:init"
+
+
+class RedisJobQueue:
+    def __init__(
+        self,
+        *,
+        config: RedisJobQueueConfig,
+        client: aioredis.Redis,
+    ):
+        self._config = config
+        self._client = client
+
+    async def push(self, job: StrategyInitJob) -> None:
+        await self._client.lpush(self._config.name, _map_job_to_redis(job))
+
+    async def pop(self, timeout: float) -> StrategyInitJob | None:
+        item = await self._client.brpop([self._config.name], timeout=timeout)
+        if item is None:
+            return None
+
+        _, data = item
+
+        return _map_redis_to_job(data)
+
+
+class MemoryJobQueue:
+    def __init__(self):
+        self._queue: asyncio.Queue[StrategyInitJob] = asyncio.Queue()
+
+    async def push(self, job: StrategyInitJob) -> None:
+        await self._queue.put(job)
+
+    async def pop(self, timeout: float) -> StrategyInitJob | None:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except TimeoutError:
+            return None
@@ -21,7 +21,11 @@ def _map_strategy_entity_to_redis(entity: StrategyEntity) -> dict[str, str]:
         "status": entity.status,
         "total_pixels": entity.total_pixels,
         "strategy": entity.strategy,
-        "positions": msgpack.encode(entity.positions)
+        "positions": msgpack.encode(entity.positions),
+        "label_encoding": entity.label_encoding,
+        "crop_box": msgpack.encode(entity.crop_box),
+        "stage": entity.stage or "",
+        "error": entity.error or "",
     }
 
 
@@ -30,10 +34,17 @@ def _map_redis_to_strategy_entity(data: dict[bytes, bytes]) -> StrategyEntity:
         if key == "positions":
             return msgpack.decode(value_bytes)
 
+        if key == "crop_box":
+            crop_box = msgpack.decode(value_bytes)
+            return tuple(crop_box) if crop_box is not None else None
+
         value = value_bytes.decode()
         if key == "total_pixels":
             return int(value)
 
+        if key in ("stage", "error"):
+            return value or None
+
         return value
 
     init_data = {}
@@ -66,6 +77,49 @@ class RedisRepository:
 
         return n_added > 0
 
+    async def save_many(
+        self,
+        entities: list[StrategyEntity],
+        ttl: int | None = None,
+    ) -> list[bool]:
+        # Single round trip for all entities
+        pipe = self._client.pipeline()
+        for entity in entities:
+            name = _get_strategy_hash_name(entity.id)
+            pipe.hset(name, mapping=_map_strategy_entity_to_redis(entity))
+
+            if ttl is not None:
+                pipe.expire(name, ttl)
+
+        results = await pipe.execute()
+        n_commands = 1 if ttl is None else 2
+
+        return [n_added > 0 for n_added in results[::n_commands]]
+
+    async def set_stage(
+        self,
+        entity_id: UUID,
+        stage: str,
+        *,
+        expected_stage: str | None,
+    ) -> bool:
+        # Only the stage field is written, a whole entity snapshot would undo
+        # whatever was saved since it was read. Compare-and-set, so a stage is
+        # never moved back, nor a hash recreated once the entity has expired
+        name = _get_strategy_hash_name(entity_id)
+
+        async def _set_stage(pipe) -> bool:
+            if await pipe.hget(name, "stage") != (expected_stage or "").encode():
+                return False
+
+            pipe.multi()
+            pipe.hset(name, "stage", stage)
+            return True
+
+        return await self._client.transaction(
+            _set_stage, name, value_from_callable=True,
+        )
+
     async def get(self, entity_id: UUID) -> StrategyEntity | None:
         name = _get_strategy_hash_name(entity_id)
         data = await self._client.hgetall(name)
@@ -75,17 +129,41 @@ class RedisRepository:
 
         return _map_redis_to_strategy_entity(data)
 
+    async def get_many(self, entity_ids: list[UUID]) -> list[StrategyEntity | None]:
+        pipe = self._client.pipeline()
+        for entity_id in entity_ids:
+            pipe.hgetall(_get_strategy_hash_name(entity_id))
+
+        return [
+            _map_redis_to_strategy_entity(data) if data else None
+            for data in await pipe.execute()
+        ]
+
     async def save_exposed_file(self, entity: ExposedFileEntity, ttl: int = 0) -> bool:
         name = _get_exposed_file_key_name(entity.id)
         is_ok = await self._client.set(
             name,
             msgpack.encode(entity),
-            nx=True,
             ex=ttl,
         )
 
         return is_ok
 
+    async def save_exposed_files(
+        self,
+        entities: list[ExposedFileEntity],
+        ttl: int = 0,
+    ) -> list[bool]:
+        pipe = self._client.pipeline()
+        for entity in entities:
+            pipe.set(
+                _get_exposed_file_key_name(entity.id),
+                msgpack.encode(entity),
+                ex=ttl,
+            )
+
+        return [bool(is_ok) for is_ok in await pipe.execute()]
+
     async def get_exposed_file(self, entity_id: UUID) -> ExposedFileEntity | None:
         name = _get_exposed_file_key_name(entity_id)
         data = await self._client.get(name)
@@ -1,7 +1,12 @@
+import asyncio
 import shutil
 import os
-from typing import NamedTuple
+from uuid import uuid4
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple
 from pathlib import Path
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
 
 from src.mapping.interfaces import IFile
@@ -17,18 +22,53 @@ async def _download_file_in_chunks(file: IFile, chunk_size: int):
         yield chunk
 
 
+def _write_file(abs_path: Path, buffer: bytes) -> None:
+    with open(abs_path, "wb") as sys_file:
+        sys_file.write(buffer)
+
+
+_TRASH_SUFFIX = ".deleted"
+
+
+def _find_trash_dirs(root_path: Path) -> list[Path]:
+    trash_dirs = []
+    for dir_path, dir_names, _ in os.walk(root_path):
+        for dir_name in [name for name in dir_names if name.endswith(_TRASH_SUFFIX)]:
+            trash_dirs.append(Path(dir_path, dir_name))
+            dir_names.remove(dir_name)  # Not walked into
+
+    return trash_dirs
+
+
+def _read_file(abs_path: Path) -> bytes | None:
+    try:
+        with open(abs_path, "rb") as sys_file:
+            return sys_file.read()
+    except FileNotFoundError:
+        return None
+
+
 class FilesystemStorageConfig(NamedTuple):
     path: str = "/tmp/storage/"
     download_chunk_size = 1024 * 1024
+    io_max_workers: int = 8
+    known_dirs_max_entries: int = 1024
 
 
 class FilesystemStorage:
     def __init__(self, *, config: FilesystemStorageConfig):
         self._config = config
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.io_max_workers,
+            thread_name_prefix="storage-io",
+        )
+        # Bounded, entity directories are left behind until they expire
+        self._known_dirs: OrderedDict[Path, None] = OrderedDict()
+        self._background_tasks: set[asyncio.Task] = set()
 
     async def exists(self, path: Path) -> bool:
         abs_path = self._filesystem_path(path)
-        exists = os.path.exists(abs_path)
+        exists = await self._run(os.path.exists, abs_path)
 
         return exists
 
@@ -38,33 +78,32 @@ class FilesystemStorage:
         )
         abs_path = self._filesystem_path(file_path)
 
-        self._ensure_path_dirs(abs_path)
+        await self._ensure_path_dirs(abs_path)
         file_chunks = _download_file_in_chunks(
             file, self._config.download_chunk_size
         )
 
-        with open(abs_path, "wb") as sys_file:
+        sys_file = await self._run(open, abs_path, "wb")
+        try:
             async for bytes_chunk in file_chunks:
-                sys_file.write(bytes_chunk)
+                await self._run(sys_file.write, bytes_chunk)
+        finally:
+            await self._run(sys_file.close)
 
         return file_path
 
     async def save_buffer(self, file_path: Path, buffer: bytes) -> Path:
         abs_path = self._filesystem_path(file_path)
-        self._ensure_path_dirs(abs_path)
-
-        with open(abs_path, "wb") as sys_file:
-            sys_file.write(buffer)
+        await self._ensure_path_dirs(abs_path)
+        await self._run(_write_file, abs_path, buffer)
 
         return file_path
 
     async def read_buffer(self, file_path: Path) -> tuple[bool, bytes | None]:
-        if not await self.exists(file_path):
-            return False, None
-
         abs_path = self._filesystem_path(file_path)
-        with open(abs_path, "rb") as sys_file:
-            file_bytes = sys_file.read()
+        file_bytes = await self._run(_read_file, abs_path)
+        if file_bytes is None:
+            return False, None
 
         return True, file_bytes
 
@@ -73,13 +112,36 @@ class FilesystemStorage:
             return False
 
         abs_path = self._filesystem_path(path)
-        if abs_path.is_dir():
-            shutil.rmtree(abs_path)
-        else:
-            os.remove(abs_path)
+        self._forget_dirs(abs_path)
+
+        if not await self._run(abs_path.is_dir):
+            await self._run(os.remove, abs_path)
+            return True
+
+        # Detach the directory right away, the tree is removed in background
+        trash_path = abs_path.with_name(
+            f".{abs_path.name}.{uuid4().hex}{_TRASH_SUFFIX}",
+        )
+        await self._run(os.rename, abs_path, trash_path)
+
+        task = asyncio.create_task(
+            self._run(shutil.rmtree, trash_path, ignore_errors=True)
+        )
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
         return True
 
+    async def purge_trash(self) -> int:
+        # Trees whose background removal was cut short by a stop or a crash
+        trash_dirs = await self._run(_find_trash_dirs, self._filesystem_path())
+        await asyncio.gather(*(
+            self._run(shutil.rmtree, trash_dir, ignore_errors=True)
+            for trash_dir in trash_dirs
+        ))
+
+        return len(trash_dirs)
+
     def get_local_filesystem_path(self, path: Path) -> Path:
         # TODO: Find a better solution, not to expose full path
         # This is required for cv2.CaptureVideo and FastAPI FileResponse
@@ -88,5 +150,24 @@ class FilesystemStorage:
     def _filesystem_path(self, *parts: str | Path) -> Path:
         return Path(self._config.path).joinpath(*parts)
 
-    def _ensure_path_dirs(self, path: Path) -> None:
-        path.parent.mkdir(parents=True, exist_ok=True)
+    async def _ensure_path_dirs(self, path: Path) -> None:
+        if path.parent in self._known_dirs:
+            self._known_dirs.move_to_end(path.parent)
+            return
+
+        await self._run(path.parent.mkdir, parents=True, exist_ok=True)
+        self._known_dirs[path.parent] = None
+        if len(self._known_dirs) > self._config.known_dirs_max_entries:
+            self._known_dirs.popitem(last=False)
+
+    def _forget_dirs(self, path: Path) -> None:
+        for known_dir in list(self._known_dirs):
+            if known_dir == path or path in known_dir.parents:
+                del self._known_dirs[known_dir]
+
+    async def _run[T](self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            self._executor, partial(fn, *args, **kwargs),
+        )
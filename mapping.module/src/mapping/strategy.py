@@ -5,11 +5,13 @@ from datetime import timedelta
 import magic
 
 from src.mapping.enums import Strategy, Status
-from src.mapping.interfaces import IStorage, IRepository, IStrategyPort
+from src.mapping.interfaces import IStorage, IRepository, IStrategyPort, IJobQueue
 from src.mapping.exceptions import (
+    MappingException,
     InvalidStrategy,
     UnsupportedFileMIME,
     StrategyNotFound,
+    StrategyInitFailed,
 )
 from src.mapping.dto import (
     StrategyInit,
@@ -17,7 +19,7 @@ from src.mapping.dto import (
     StrategyRead,
     StrategyReadResult,
 )
-from src.mapping.entity import StrategyEntity
+from src.mapping.entity import StrategyEntity, StrategyInitJob
 
 
 class StrategyPortConfig(NamedTuple):
@@ -33,11 +35,13 @@ class StrategyPort:
         config: StrategyPortConfig,
         storage: IStorage,
         repository: IRepository,
+        job_queue: IJobQueue,
         strategies: dict[Strategy, IStrategyPort],
     ):
         self._config = config
         self._storage = storage
         self._repository = repository
+        self._job_queue = job_queue
         self._strategies = strategies
 
     async def init(self, dto: StrategyInit) -> StrategyInitResult:
@@ -55,25 +59,65 @@ class StrategyPort:
             total_pixels=dto.total_pixels,
             strategy=dto.strategy,
             positions=[],
+            label_encoding=dto.label_encoding,
+            crop_box=dto.roi,
         )
 
         await dto.file.seek(0)
-        downloaded_file_path = await self._storage.download_file(
-            path=entity.path_dir,
-            name=self._config.download_file_name,
-            file=dto.file,
-        )
+        try:
+            downloaded_file_path = await self._storage.download_file(
+                path=entity.path_dir,
+                name=self._config.download_file_name,
+                file=dto.file,
+            )
+        except Exception:
+            # Upload was interrupted or rejected, nothing is queued for it
+            await self._storage.delete(entity.path_dir)
+            raise
 
-        await strategy.init(entity, downloaded_file_path)
-        await self._repository.save(
-            entity, ttl=self._config.entity_retention_period.seconds
+        await self._save_entity(entity)
+        await self._job_queue.push(
+            StrategyInitJob(
+                entity_id=entity.id,
+                downloaded_file_path=downloaded_file_path,
+            )
         )
 
         return StrategyInitResult(id=entity.id)
 
+    async def process(self, job: StrategyInitJob) -> None:
+        entity = await self._repository.get(job.entity_id)
+        if entity is None:
+            # Expired while waiting in the queue
+            await self._storage.delete(job.downloaded_file_path)
+            return
+
+        entity.status = Status.PROCESSING
+        await self._save_entity(entity)
+
+        try:
+            await self._strategies[entity.strategy].init(
+                entity, job.downloaded_file_path,
+            )
+        except MappingException as exc:
+            entity.status, entity.error = Status.FAILED, str(exc)
+        except Exception:
+            entity.status, entity.error = Status.FAILED, str(StrategyInitFailed())
+            await self._save_entity(entity)
+            raise
+        else:
+            entity.status = Status.READY
+
+        await self._save_entity(entity)
+
     async def read(self, dto: StrategyRead) -> StrategyReadResult:
         entity = await self._repository.get(dto.id)
         if entity is None:
             raise StrategyNotFound()
 
         return StrategyReadResult.from_entity(entity)
+
+    async def _save_entity(self, entity: StrategyEntity) -> None:
+        await self._repository.save(
+            entity, ttl=self._config.entity_retention_period.seconds
+        )
@@ -0,0 +1,226 @@
+import cv2
+import numpy as np
+import pytest
+
+from pkg.graylabel import (
+    LabelEncoding,
+    LabelThreshold,
+    ReadLabelException,
+    read_labels,
+    read_labels_with_confidence,
+)
+from pkg.graylabel.common import (
+    get_n_pattern_frames,
+    get_n_unique_frames_required,
+    number_from_graylabel_bits,
+)
+from pkg.graylabel.constants import RD_LABEL_RADIUS_RANGE
+
+
+# Per-pixel loop read_labels was vectorized from, kept as the reference
+def _sample_ring_hsv(frame, coord, radius_range, *, step_angle=30):
+    x, y = coord
+    height, width = frame.shape[:2]
+    ring_pixels = []
+
+    for radius in range(*radius_range):
+        for angle_deg in range(0, 360, step_angle):
+            radians = np.radians(angle_deg)
+            px = int(x + radius * np.cos(radians))
+            py = int(y + radius * np.sin(radians))
+
+            if not (0 <= px < width and 0 <= py < height):
+                continue
+
+            ring_pixels.append(frame[py, px])
+
+    return np.array(ring_pixels, dtype=np.uint8)
+
+
+def _get_average_brightness_hsv(frame, coord, radius_range):
+    ring_pixels = _sample_ring_hsv(frame, coord, radius_range)
+    if not ring_pixels.size:
+        return 0.0
+
+    return float(ring_pixels[:, 2].mean())
+
+
+def _read_labels_reference(frames, n_pixels, pixels, *, on_threshold_scatter=10):
+    required_n_frames = get_n_unique_frames_required(n_pixels)
+    base_frame, *rest_frames = frames
+    base_frame_hsv = cv2.cvtColor(base_frame, cv2.COLOR_BGR2HSV)
+    pixels_brightness_map = {
+        coord: _get_average_brightness_hsv(base_frame_hsv, coord, RD_LABEL_RADIUS_RANGE)
+        for coord in pixels
+    }
+
+    positions_bits = {coord: [] for coord in pixels}
+    for frame_idx in range(required_n_frames):
+        frame_hsv = cv2.cvtColor(rest_frames[frame_idx], cv2.COLOR_BGR2HSV)
+        for coord in positions_bits:
+            brightness = _get_average_brightness_hsv(frame_hsv, coord, RD_LABEL_RADIUS_RANGE)
+            state = int(brightness >= pixels_brightness_map[coord] - on_threshold_scatter)
+            positions_bits[coord].append(state)
+
+    return {
+        number_from_graylabel_bits(reversed(bits)): coord
+        for coord, bits in positions_bits.items()
+    }
+
+
+def _unique_label_pixels(frames, n_pixels, pixels):
+    # The reference silently keeps the last pixel of colliding labels, while
+    # read_labels rejects collisions, so only the first pixel of each label
+    # is kept
+    labels = {
+        coord: next(iter(_read_labels_reference(frames, n_pixels, [coord])))
+        for coord in dict.fromkeys(pixels)
+    }
+    first_coords = {}
+    for coord, label in labels.items():
+        first_coords.setdefault(label, coord)
+
+    return [coord for coord in pixels if first_coords[labels[coord]] == coord]
+
+
+def test_read_labels_matches_reference_on_random_frames():
+    rng = np.random.default_rng(0)
+    height, width = 48, 64
+    n_pixels = 1024  # Every 10-bit label is in range
+    n_frames = get_n_unique_frames_required(n_pixels) + 1
+    # Partly and fully out-of-frame pixels go first, so they are kept
+    edge_pixels = [(-50, -50), (0, 0), (width - 1, height - 1), (-1, 10), (width + 1, 5)]
+
+    checked_edge_pixels = set()
+    for _ in range(5):
+        frames = [
+            rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+            for _ in range(n_frames)
+        ]
+        random_pixels = [
+            (int(x), int(y))
+            for x, y in zip(rng.integers(0, width, 300), rng.integers(0, height, 300))
+        ]
+        pixels = _unique_label_pixels(frames, n_pixels, edge_pixels + random_pixels)
+        checked_edge_pixels.update(set(edge_pixels) & set(pixels))
+
+        # Duplicates are read once, as the reference did
+        pixels = pixels + pixels[:10]
+
+        assert read_labels(frames, n_pixels, pixels) == _read_labels_reference(
+            frames, n_pixels, pixels,
+        )
+
+    assert checked_edge_pixels == set(edge_pixels)
+
+
+_LED_COLOR = 60, 60, 255
+
+
+def _get_frames_colors(label, n_pixels, encoding):
+    # Colors a pixel is lit with in the base and every pattern frame, in the
+    # layout the LED controller shows them, None is unlit
+    n_bits = get_n_unique_frames_required(n_pixels)
+    gray = label ^ (label >> 1)
+    bits = [(gray >> bit_idx) & 1 for bit_idx in range(n_bits)]
+
+    match encoding:
+        case LabelEncoding.GRAY_PARITY:
+            pattern_bits = bits + [sum(bits) % 2]
+        case LabelEncoding.GRAY_COMPLEMENT:
+            pattern_bits = [state for bit in bits for state in (bit, 1 - bit)]
+        case LabelEncoding.GRAY_RGB:
+            # Frame i shows bits 3i, 3i + 1 and 3i + 2 on red, green and blue
+            n_frames = get_n_pattern_frames(n_pixels, encoding)
+            bits += [0] * (n_frames * 3 - n_bits)
+            return [(255, 255, 255)] + [
+                (20 + 235 * blue, 20 + 235 * green, 20 + 235 * red)
+                for red, green, blue in zip(bits[0::3], bits[1::3], bits[2::3])
+            ]
+        case _:
+            pattern_bits = bits
+
+    return [_LED_COLOR] + [_LED_COLOR if bit else None for bit in pattern_bits]
+
+
+def _draw_label_frames(
+    pixels_labels, n_pixels, shape=(32, 32, 3), encoding=LabelEncoding.GRAY,
+):
+    # Base frame with every pixel lit, then the encoding pattern frames
+    n_frames = get_n_pattern_frames(n_pixels, encoding) + 1
+    frames = [np.full(shape, 20, dtype=np.uint8) for _ in range(n_frames)]
+    for (x, y), label in pixels_labels.items():
+        colors = _get_frames_colors(label, n_pixels, encoding)
+        for frame, color in zip(frames, colors, strict=True):
+            if color is not None:
+                cv2.circle(frame, (x, y), 3, color, -1)
+
+    return frames
+
+
+def test_read_labels_rejects_labels_beyond_n_pixels():
+    n_pixels = 20
+    pixels_labels = {(8, 8): 3, (24, 8): 25, (8, 24): 7}
+    frames = _draw_label_frames(pixels_labels, n_pixels)
+
+    assert read_labels(frames, 32, list(pixels_labels)) == {
+        label: coord for coord, label in pixels_labels.items()
+    }
+    with pytest.raises(ReadLabelException):
+        read_labels(frames, n_pixels, list(pixels_labels))
+
+
+@pytest.mark.parametrize("exposure_gain", [0.9, 1.0, 1.1])
+def test_read_labels_adaptive_survives_exposure_shift(exposure_gain):
+    # Label 42 is lit in every pattern frame, label 0 in none of them
+    n_pixels = 60
+    pixels_labels = {(6, 6): 42, (18, 6): 0, (30, 6): 21, (6, 18): 59, (18, 18): 5}
+    base_frame, *pattern_frames = _draw_label_frames(
+        pixels_labels, n_pixels, shape=(26, 38, 3),
+    )
+    frames = [base_frame] + [
+        cv2.convertScaleAbs(frame, alpha=exposure_gain)
+        for frame in pattern_frames
+    ]
+
+    assert read_labels(
+        frames, n_pixels, list(pixels_labels),
+        threshold_mode=LabelThreshold.ADAPTIVE,
+    ) == {label: coord for coord, label in pixels_labels.items()}
+
+
+@pytest.mark.parametrize("threshold_mode", list(LabelThreshold))
+@pytest.mark.parametrize("encoding", list(LabelEncoding))
+def test_read_labels_reads_back_every_encoding(encoding, threshold_mode):
+    n_pixels = 60
+    pixels_labels = {(6, 6): 42, (18, 6): 0, (30, 6): 21, (6, 18): 59, (18, 18): 5}
+    frames = _draw_label_frames(
+        pixels_labels, n_pixels, shape=(26, 38, 3), encoding=encoding,
+    )
+
+    assert read_labels(
+        frames, n_pixels, list(pixels_labels),
+        encoding=encoding, threshold_mode=threshold_mode,
+    ) == {label: coord for coord, label in pixels_labels.items()}
+    with pytest.raises(ReadLabelException):
+        read_labels(frames[:-1], n_pixels, list(pixels_labels), encoding=encoding)
+
+
+def test_read_labels_parity_flips_weakest_bit():
+    n_pixels = 60
+    pixels_labels = {(6, 6): 21, (18, 6): 42}
+    frames = _draw_label_frames(
+        pixels_labels, n_pixels, shape=(14, 26, 3), encoding=LabelEncoding.GRAY_PARITY,
+    )
+    # Bit 2 of label 21 is lit too dimly to pass the base threshold
+    cv2.circle(frames[3], (6, 6), 3, (60, 60, 200), -1)
+
+    positions = read_labels_with_confidence(
+        frames, n_pixels, list(pixels_labels), encoding=LabelEncoding.GRAY_PARITY,
+    )
+
+    assert {label: coord for label, (coord, _) in positions.items()} == {
+        label: coord for coord, label in pixels_labels.items()
+    }
+    # The guessed correction is reported as less certain
+    assert positions[21][1] < positions[42][1]
@@ -0,0 +1,45 @@
+import numpy as np
+
+from pkg.graylabel import darken_tone
+from pkg.graylabel.constants import UINT8_SCALE, FLOAT_SCALE, ADJUSTMENT_SCALE
+
+
+# Float pipeline the lookup table was derived from, kept as the reference
+def _darken_tone_reference(frame, *, contrast, highlights, shadows, gamma):
+    img_f = frame.astype(np.float32) * FLOAT_SCALE
+
+    c = (contrast / ADJUSTMENT_SCALE) + 1.0
+    img_f = (img_f - 0.5) * c + 0.5
+    img_f = np.clip(img_f, 0.0, 1.0)
+
+    s = shadows / ADJUSTMENT_SCALE
+    shadow_mask = 1.0 - img_f
+    img_f = img_f + s * shadow_mask * img_f
+    img_f = np.clip(img_f, 0.0, 1.0)
+
+    h = highlights / ADJUSTMENT_SCALE
+    highlight_mask = img_f
+    img_f = img_f + h * highlight_mask * (1.0 - img_f)
+    img_f = np.clip(img_f, 0.0, 1.0)
+
+    g = gamma / ADJUSTMENT_SCALE
+    gamma_value = 1.0 - g
+    img_f = img_f ** gamma_value
+    img_f = np.clip(img_f, 0.0, 1.0)
+
+    return (img_f * UINT8_SCALE).astype(np.uint8)
+
+
+def test_darken_tone_matches_float_pipeline_for_all_values():
+    # Every uint8 value in every channel, as a 3-channel frame
+    values = np.arange(256, dtype=np.uint8)
+    frame = np.stack([values, values[::-1], np.roll(values, 128)], axis=-1)
+    frame = frame.reshape(16, 16, 3)
+
+    expected = _darken_tone_reference(
+        frame, contrast=10, highlights=-60, shadows=-100, gamma=-40,
+    )
+    toned = darken_tone(frame)
+
+    assert toned.dtype == expected.dtype
+    assert toned.tobytes() == expected.tobytes()
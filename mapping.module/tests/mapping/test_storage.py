@@ -0,0 +1,68 @@
+import asyncio
+import os
+import threading
+from pathlib import Path
+
+from src.mapping.storage import FilesystemStorage, FilesystemStorageConfig
+
+
+def test_read_buffer_does_not_serialize_reads(tmp_path):
+    # Opening a FIFO blocks until a writer shows up, the other read must
+    # complete in the meantime
+    os.mkfifo(tmp_path / "slow")
+    (tmp_path / "fast").write_bytes(b"fast")
+    storage = FilesystemStorage(config=FilesystemStorageConfig(path=str(tmp_path)))
+
+    release = threading.Event()
+
+    def _feed_slow():
+        # Released by the test, or by the timeout if reads got serialized
+        release.wait(timeout=5)
+        with open(tmp_path / "slow", "wb") as fifo:
+            fifo.write(b"slow")
+
+    threading.Thread(target=_feed_slow, daemon=True).start()
+
+    async def _read_both():
+        slow_read = asyncio.create_task(storage.read_buffer(Path("slow")))
+        await asyncio.sleep(0)  # Slow read is started first
+        fast_result = await storage.read_buffer(Path("fast"))
+        is_slow_pending = not slow_read.done()
+        release.set()
+
+        return fast_result, is_slow_pending, await slow_read
+
+    assert asyncio.run(_read_both()) == ((True, b"fast"), True, (True, b"slow"))
+
+
+def test_known_dirs_are_bounded(tmp_path):
+    storage = FilesystemStorage(config=FilesystemStorageConfig(
+        path=str(tmp_path), known_dirs_max_entries=2,
+    ))
+
+    async def _save_all():
+        for dir_idx in range(5):
+            await storage.save_buffer(Path(str(dir_idx), "frame.jpg"), b"frame")
+
+        # Evicted directories are created again if needed
+        await storage.delete(Path("0"))
+        await storage.save_buffer(Path("0", "frame.jpg"), b"frame")
+
+    asyncio.run(_save_all())
+
+    assert len(storage._known_dirs) == 2
+    assert (tmp_path / "0" / "frame.jpg").read_bytes() == b"frame"
+
+
+def test_purge_trash_removes_leftover_deleted_dirs(tmp_path):
+    for trash_dir in (".a.1f.deleted", "b/.c.2f.deleted/d"):
+        (tmp_path / trash_dir).mkdir(parents=True)
+        (tmp_path / trash_dir / "frame.jpg").write_bytes(b"frame")
+    (tmp_path / "e").mkdir()
+
+    storage = FilesystemStorage(config=FilesystemStorageConfig(path=str(tmp_path)))
+
+    assert asyncio.run(storage.purge_trash()) == 2
+    assert sorted(
+        str(path.relative_to(tmp_path)) for path in tmp_path.rglob("*")
+    ) == ["b", "e"]
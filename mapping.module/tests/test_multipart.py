@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from pkg.multipart import MultipartStreamReader, MultipartStreamException
+
+
+_CONTENT_TYPE = "multipart/form-data; boundary=B"
+
+
+def _field(name, value):
+    return b"--B\r\nContent-Disposition: form-data; name=\"%s\"\r\n\r\n%s\r\n" % (
+        name.encode(), value,
+    )
+
+
+def _file(name, content):
+    return (
+        b"--B\r\nContent-Disposition: form-data; name=\"%s\"; filename=\"clip.mp4\"\r\n"
+        b"Content-Type: video/mp4\r\n\r\n%s\r\n" % (name.encode(), content)
+    )
+
+
+async def _chunks(body, chunk_size=7):
+    for start in range(0, len(body), chunk_size):
+        yield body[start:start + chunk_size]
+
+
+def _read(body, **limits):
+    async def _read_all():
+        reader = MultipartStreamReader(_CONTENT_TYPE, _chunks(body), **limits)
+        fields, file = await reader.read_until_file()
+        content = await file.read(len(body)) if file is not None else None
+        trailing_fields = await reader.read_trailing_fields()
+        return fields, content, trailing_fields
+
+    return asyncio.run(_read_all())
+
+
+def test_reader_streams_fields_file_and_trailing_fields():
+    body = _field("a", b"1") + _file("file", b"x" * 50) + _field("b", b"2") + b"--B--\r\n"
+
+    assert _read(body) == ({"a": "1"}, b"x" * 50, {"b": "2"})
+
+
+@pytest.mark.parametrize("body", [
+    # Malformed, the boundary doesn't match
+    b"--C\r\nContent-Disposition: form-data; name=\"a\"\r\n\r\n1\r\n--C--\r\n",
+    # Truncated inside the file part
+    _field("a", b"1") + _file("file", b"x" * 50)[:-20],
+])
+def test_reader_rejects_broken_body(body):
+    with pytest.raises(MultipartStreamException):
+        _read(body)
+
+
+def test_reader_limits_fields():
+    oversized = _field("a", b"1" * 65) + _file("file", b"x") + b"--B--\r\n"
+    with pytest.raises(MultipartStreamException):
+        _read(oversized, max_part_size=64)
+
+    too_many = b"".join(_field(f"f{i}", b"1") for i in range(4)) + b"--B--\r\n"
+    with pytest.raises(MultipartStreamException):
+        _read(too_many, max_fields=3)
+
+    # The file part itself isn't bound by the field size limit
+    body = _field("a", b"1") + _file("file", b"x" * 128) + b"--B--\r\n"
+    assert _read(body, max_part_size=64)[1] == b"x" * 128